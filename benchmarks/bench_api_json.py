@@ -0,0 +1,78 @@
+# benchmarks/bench_api_json.py
+"""Requests per second for /api/players: pandas to_dict + jsonify vs. the plain row path
+
+    python benchmarks/bench_api_json.py [--players 100000] [--seconds 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import pandas as pd
+from flask import Response, jsonify
+
+import nba_web_app
+from synthetic import insert_players
+
+def populate(n_players):
+    conn = nba_web_app.connect_db()
+    nba_web_app.migrate_db(conn)
+    rng = random.Random(42)
+    teams = [team[1] for team in nba_web_app.SAMPLE_TEAMS]
+    insert_players(conn, n_players, teams, rng)
+    conn.commit()
+    conn.close()
+
+def legacy_api_players():
+    players = pd.read_sql_query("SELECT * FROM players", nba_web_app.get_db()).to_dict('records')
+    return jsonify(players)
+
+def rows_api_players():
+    # The row path /api/players uses, without pagination, for a like-for-like comparison
+    cursor = nba_web_app.get_db().execute("SELECT * FROM players")
+    columns = [col[0] for col in cursor.description]
+    rows = [dict(zip(columns, row)) for row in cursor]
+    return Response(nba_web_app.dumps_json(rows), mimetype='application/json')
+
+def measure(client, url, seconds):
+    client.get(url)
+    count = 0
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        response = client.get(url)
+        assert response.status_code == 200
+        count += 1
+    elapsed = time.perf_counter() - start
+    return count / elapsed, len(response.data)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--players', type=int, default=100_000)
+    parser.add_argument('--seconds', type=float, default=5.0)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nba_web_app.app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        populate(args.players)
+        nba_web_app.app.add_url_rule('/bench/legacy-players', view_func=legacy_api_players)
+        nba_web_app.app.add_url_rule('/bench/rows-players', view_func=rows_api_players)
+        client = nba_web_app.app.test_client()
+
+        print(f'{args.players} players, orjson={"yes" if nba_web_app.orjson else "no"}')
+        results = {}
+        for label, url in [('before (pandas + jsonify)', '/bench/legacy-players'),
+                           ('after (rows + dumps_json)', '/bench/rows-players'),
+                           ('/api/players, one page', f'/api/players?limit={nba_web_app.API_MAX_LIMIT}')]:
+            rps, size = measure(client, url, args.seconds)
+            results[label] = rps
+            print(f'  {label:28} {rps:8.2f} req/s  {size / 1e6:6.2f} MB/response')
+        before, after = list(results.values())[:2]
+        print(f'  full-table speedup: {after / before:.2f}x')
+        nba_web_app.close_all_db()
+
+if __name__ == '__main__':
+    main()
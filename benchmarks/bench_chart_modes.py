@@ -0,0 +1,74 @@
+# benchmarks/bench_chart_modes.py
+"""CPU per chart build and bytes on the wire for the png, svg and client chart modes
+
+    python benchmarks/bench_chart_modes.py [--teams 30] [--repeat 20]
+
+Build time is what a request (or the pre-render worker) pays when the data
+behind a chart changes; cached responses cost the same in every mode.
+"""
+import argparse
+import gzip
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..'))
+
+import nba_web_app
+
+def populate(n_teams):
+    conn = nba_web_app.connect_db()
+    nba_web_app.migrate_db(conn)
+    rng = random.Random(42)
+    conn.executemany(
+        'INSERT INTO teams VALUES (?, ?, ?, ?, ?, ?, ?)',
+        ((i, f'Team {i}', rng.choice(['East', 'West']), wins, 82 - wins,
+          round(rng.uniform(100, 125), 1), round(rng.uniform(100, 125), 1))
+         for i, wins in ((i, rng.randint(15, 67)) for i in range(1, n_teams + 1))))
+    conn.commit()
+    conn.close()
+
+def cpu_ms(build, repeat):
+    build()
+    start = time.process_time()
+    for _ in range(repeat):
+        result = build()
+    return (time.process_time() - start) * 1000 / repeat, result
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--teams', type=int, default=30)
+    parser.add_argument('--repeat', type=int, default=20)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        nba_web_app.app.config['DATABASE'] = os.path.join(tmp, 'bench.db')
+        populate(args.teams)
+        snapshot = nba_web_app.get_dashboard_snapshot()
+        client = nba_web_app.app.test_client()
+
+        print(f'{args.teams} teams, {args.repeat} builds per chart')
+        print(f'  {"mode":8} {"chart":9} {"cpu ms":>8} {"bytes":>8} {"gzip":>8}')
+        for name, data in snapshot.chart_data.items():
+            cols = nba_web_app.chart_columns(data)
+            series = nba_web_app.CHART_SERIES[name]
+            builds = {
+                'png': lambda: nba_web_app.CHARTS[name](cols),
+                'svg': lambda: nba_web_app.render_svg_chart(series(data)).encode(),
+                'client': lambda: nba_web_app.dumps_json(series(data)),
+            }
+            for mode, build in builds.items():
+                ms, body = cpu_ms(build, args.repeat)
+                print(f'  {mode:8} {name:9} {ms:8.2f} {len(body):8} {len(gzip.compress(body)):8}')
+
+        # The client mode also ships its renderer, a separately cached asset
+        page = client.get('/?charts=client').data.decode()
+        renderer = client.get(re.findall(r'<script src="([^"]*charts\.js[^"]*)"', page)[0]).data
+        print(f'  client renderer script: {len(renderer)} bytes, {len(gzip.compress(renderer))} gzipped (cached once)')
+        nba_web_app.close_all_db()
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,58 @@
+# benchmarks/bench_import_time.py
+"""Cold-start cost of importing the web app, from `python -X importtime`
+
+    python benchmarks/bench_import_time.py [--runs 5] [--budget-ms 600]
+
+Fails if pandas, NumPy or matplotlib are imported at start-up, or if the
+median import time exceeds the budget.
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+HEAVY_MODULES = ('pandas', 'numpy', 'matplotlib')
+
+def import_profile():
+    """({module: cumulative microseconds} for depth 0-1, set of every module imported)"""
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', 'import nba_web_app'],
+        cwd=ROOT, capture_output=True, text=True, check=True)
+    profile, imported = {}, set()
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, raw_name = line[len('import time:'):].split('|')
+        name = raw_name.strip()
+        imported.add(name)
+        # Nesting is shown as two spaces per level after the separator's own space
+        if (len(raw_name) - len(raw_name.lstrip()) - 1) // 2 <= 1:
+            profile[name] = int(cumulative)
+    return profile, imported
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--budget-ms', type=float, default=600)
+    parser.add_argument('--top', type=int, default=10)
+    args = parser.parse_args()
+
+    runs = [import_profile() for _ in range(args.runs)]
+    total_ms = statistics.median(profile['nba_web_app'] for profile, _ in runs) / 1000
+    last, imported = runs[-1]
+
+    print(f'import nba_web_app: median {total_ms:.1f} ms over {args.runs} runs')
+    for name, micros in sorted(last.items(), key=lambda item: -item[1])[:args.top]:
+        print(f'  {micros / 1000:8.1f} ms  {name}')
+
+    heavy = sorted({name.split('.')[0] for name in imported} & set(HEAVY_MODULES))
+    if heavy:
+        sys.exit(f'FAIL: imported at start-up: {", ".join(heavy)}')
+    if total_ms > args.budget_ms:
+        sys.exit(f'FAIL: {total_ms:.1f} ms exceeds the {args.budget_ms:.0f} ms budget')
+    print('OK')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,298 @@
+# benchmarks/bench_routes.py
+"""Latency, throughput and peak RSS for every route against a synthetic league
+
+    python benchmarks/bench_routes.py [--scale small|medium|large] [--players N] [--games N]
+                                      [--seconds 2] [--http] [--concurrency 8]
+                                      [--routes / /api/teams ...] [--save-baseline]
+
+Each route runs in its own subprocess against one generated database, so the
+peak RSS reported is that of a worker serving only that route. Requests go
+through Flask's test client, or with --http through a local threaded HTTP
+server from --concurrency client threads. draw:<chart> and svg:<chart> time
+the chart functions themselves, without the chart cache.
+
+Results are compared with --baseline when it was recorded with the same
+options, --seconds and machine (CPU model and count, Python version);
+otherwise the differences are reported and the comparison is skipped. A
+route fails if its p50/p95 latency or peak RSS grows, or its requests per
+second drop, by more than --tolerance (and by more than a small absolute
+slack, so sub-millisecond jitter does not count). Refresh the baseline with
+--save-baseline.
+"""
+import argparse
+import csv
+import json
+import logging
+import os
+import platform
+import random
+import resource
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.request
+from datetime import date, timedelta
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+sys.path.insert(0, ROOT)
+
+from synthetic import insert_players
+
+SCALES = {
+    'small': {'teams': 30, 'players': 450, 'games': 1_230},
+    'medium': {'teams': 30, 'players': 10_000, 'games': 100_000},
+    'large': {'teams': 30, 'players': 100_000, 'games': 1_000_000},
+}
+ROUTES = [
+    '/', '/?charts=svg', '/api/teams', '/api/players', '/api/players?limit=5000&ppg>=10',
+    '/api/games?team=1', '/api/head-to-head?team=1', '/api/metrics/teams', '/api/metrics/splits',
+    '/api/metrics/rolling?team=Boston%20Celtics', '/charts/win-loss.png', '/charts/ppg.png',
+    '/charts/ppg.svg', '/api/export/players.csv', '/api/search?q=player%2042',
+    '/api/search?q=plyer%2042', '/api/snapshots/games', '/api/seasons', 'draw:win-loss', 'draw:ppg', 'svg:win-loss', 'svg:ppg',
+]
+HEADERS = {'Accept-Encoding': 'gzip, br'}
+DEFAULT_BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'baseline.json')
+
+# Differences below these never count as regressions
+LATENCY_SLACK_MS = 1.0
+RSS_SLACK_MB = 5.0
+
+def populate(path, n_teams, n_players, n_games, seed=42):
+    """Write a synthetic league to the database at `path`, loading games through ingest_games
+
+    The last season generated is the current one; games of earlier seasons go
+    to their own season databases, as ingest_games files them.
+    """
+    os.environ['NBA_DATABASE'] = path
+    import nba_web_app
+
+    rng = random.Random(seed)
+    names = [team[1] for team in nba_web_app.SAMPLE_TEAMS][:n_teams]
+    names += [f'Team {i}' for i in range(len(names) + 1, n_teams + 1)]
+    conn = nba_web_app.connect_db()
+    nba_web_app.migrate_db(conn)
+    with conn:
+        conn.executemany(
+            'INSERT INTO teams VALUES (?, ?, ?, 0, 0, 0, 0)',
+            ((i, name, ('East', 'West')[i % 2]) for i, name in enumerate(names, 1)))
+        insert_players(conn, n_players, names, rng)
+    conn.close()
+
+    # Each day every team plays once, against a different opponent each day
+    games_path = os.path.join(os.path.dirname(path), 'games.csv')
+    with open(games_path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(nba_web_app.GAME_COLUMNS)
+        day, written = date(2000, 10, 1), 0
+        while written < n_games:
+            order = rng.sample(names, len(names))
+            for home, away in zip(order[::2], order[1::2]):
+                if written == n_games:
+                    break
+                writer.writerow((day.isoformat(), home, away,
+                                 rng.randint(85, 135), rng.randint(85, 135)))
+                written += 1
+                last_day = day
+            day += timedelta(days=1)
+    conn = nba_web_app.connect_db()
+    with conn:
+        nba_web_app.save_setting(conn, 'current_season', nba_web_app.season_for_date(last_day.isoformat()))
+    conn.close()
+    nba_web_app.ingest_games([games_path])
+    os.remove(games_path)
+
+def machine_fingerprint():
+    """CPU model and count, architecture and Python version; timings only compare on a match"""
+    model = platform.processor()
+    try:
+        with open('/proc/cpuinfo') as f:
+            model = next(line.split(':', 1)[1].strip() for line in f if line.startswith('model name'))
+    except (OSError, StopIteration):
+        pass
+    return f'{model} x{os.cpu_count()} {platform.machine()} {platform.python_implementation()} ' \
+           f'{platform.python_version()}'
+
+def percentile(latencies, q):
+    return statistics.quantiles(latencies, n=100, method='inclusive')[q - 1] if len(latencies) > 1 \
+        else latencies[0]
+
+def _measure_client(app, route, seconds):
+    client = app.test_client()
+
+    def request():
+        response = client.get(route, headers=HEADERS)
+        response.get_data()
+        assert response.status_code == 200, f'{route}: HTTP {response.status_code}'
+
+    request()
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        t0 = time.perf_counter()
+        request()
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+def _measure_http(app, route, seconds, concurrency):
+    from werkzeug.serving import make_server
+
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    url = f'http://127.0.0.1:{server.server_port}{route}'.replace(' ', '%20')
+
+    def request():
+        with urllib.request.urlopen(urllib.request.Request(url, headers=HEADERS)) as response:
+            response.read()
+
+    request()
+    latencies = []
+    start = time.perf_counter()
+    deadline = start + seconds
+
+    def client():
+        while time.perf_counter() < deadline:
+            t0 = time.perf_counter()
+            request()
+            latencies.append(time.perf_counter() - t0)
+
+    threads = [threading.Thread(target=client) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    server.shutdown()
+    return latencies, elapsed
+
+def _measure_function(nba_web_app, route, seconds):
+    kind, name = route.split(':')
+    with nba_web_app.app.app_context():
+        data = nba_web_app.get_dashboard_snapshot().chart_data[name]
+    if kind == 'draw':
+        cols = nba_web_app.chart_columns(data)
+        build = lambda: nba_web_app.CHARTS[name](cols)
+    else:
+        build = lambda: nba_web_app.render_svg_chart(nba_web_app.CHART_SERIES[name](data))
+    build()
+    latencies = []
+    start = time.perf_counter()
+    while time.perf_counter() - start < seconds:
+        t0 = time.perf_counter()
+        build()
+        latencies.append(time.perf_counter() - t0)
+    return latencies, time.perf_counter() - start
+
+def run_worker(route, seconds, http, concurrency):
+    """Measure one route in this process; returns the result dict"""
+    import nba_web_app
+
+    if not route.startswith('/'):
+        latencies, elapsed = _measure_function(nba_web_app, route, seconds)
+    elif http:
+        latencies, elapsed = _measure_http(nba_web_app.app, route, seconds, concurrency)
+    else:
+        latencies, elapsed = _measure_client(nba_web_app.app, route, seconds)
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return {
+        'requests': len(latencies),
+        'rps': round(len(latencies) / elapsed, 2),
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+        # ru_maxrss is KiB on Linux, bytes on macOS
+        'rss_mb': round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1),
+    }
+
+def regressions(route, result, baseline, tolerance):
+    """Descriptions of the ways `result` is worse than `baseline` for `route`"""
+    found = []
+    for key in ('p50_ms', 'p95_ms'):
+        old, new = baseline[key], result[key]
+        if new > old * (1 + tolerance) and new - old > LATENCY_SLACK_MS:
+            found.append(f'{route}: {key} {old} -> {new}')
+    old, new = baseline['rps'], result['rps']
+    if new < old * (1 - tolerance) and 1000 / new - 1000 / old > LATENCY_SLACK_MS:
+        found.append(f'{route}: rps {old} -> {new}')
+    old, new = baseline['rss_mb'], result['rss_mb']
+    if new > old * (1 + tolerance) and new - old > RSS_SLACK_MB:
+        found.append(f'{route}: rss_mb {old} -> {new}')
+    return found
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--scale', choices=SCALES, default='small')
+    parser.add_argument('--teams', type=int)
+    parser.add_argument('--players', type=int)
+    parser.add_argument('--games', type=int)
+    parser.add_argument('--seconds', type=float, default=2.0, help='Measuring time per route.')
+    parser.add_argument('--http', action='store_true', help='Use a local HTTP server, not the test client.')
+    parser.add_argument('--concurrency', type=int, default=8, help='Client threads with --http.')
+    parser.add_argument('--routes', nargs='+', default=ROUTES)
+    parser.add_argument('--baseline', default=DEFAULT_BASELINE)
+    parser.add_argument('--save-baseline', action='store_true')
+    parser.add_argument('--tolerance', type=float, default=0.25)
+    parser.add_argument('--worker', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, args.seconds, args.http, args.concurrency)))
+        return
+
+    options = dict(SCALES[args.scale])
+    options.update({key: getattr(args, key) for key in options if getattr(args, key) is not None})
+    options.update(http=args.http, concurrency=args.concurrency if args.http else 1,
+                   seconds=args.seconds, machine=machine_fingerprint())
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        start = time.perf_counter()
+        populate(path, options['teams'], options['players'], options['games'])
+        print(f'{options["teams"]} teams, {options["players"]} players, {options["games"]} games '
+              f'generated in {time.perf_counter() - start:.1f}s; '
+              f'{"HTTP x" + str(args.concurrency) if args.http else "test client"}')
+
+        results = {}
+        print(f'  {"route":44} {"req/s":>9} {"p50 ms":>8} {"p95 ms":>8} {"p99 ms":>8} {"RSS MB":>7}')
+        for route in args.routes:
+            command = [sys.executable, os.path.abspath(__file__), '--worker', route,
+                       '--seconds', str(args.seconds), '--concurrency', str(args.concurrency)]
+            if args.http:
+                command.append('--http')
+            output = subprocess.run(command, env=dict(os.environ, NBA_DATABASE=path), cwd=ROOT,
+                                    capture_output=True, text=True)
+            if output.returncode:
+                sys.exit(f'FAIL: {route}\n{output.stderr}')
+            result = results[route] = json.loads(output.stdout.splitlines()[-1])
+            print(f'  {route:44} {result["rps"]:9.1f} {result["p50_ms"]:8.2f} {result["p95_ms"]:8.2f} '
+                  f'{result["p99_ms"]:8.2f} {result["rss_mb"]:7.1f}')
+
+    if args.save_baseline:
+        with open(args.baseline, 'w') as f:
+            json.dump({'options': options, 'routes': results}, f, indent=2)
+            f.write('\n')
+        print(f'Baseline saved to {args.baseline}')
+        return
+
+    if not os.path.exists(args.baseline):
+        print('No baseline to compare with; record one with --save-baseline')
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    if baseline['options'] != options:
+        differences = ', '.join(f'{key} {baseline["options"].get(key)!r} here {options.get(key)!r}'
+                                for key in sorted(baseline['options'].keys() | options.keys())
+                                if baseline['options'].get(key) != options.get(key))
+        print(f'Baseline was recorded with different options ({differences}); not comparing')
+        return
+    found = [problem for route, result in results.items() if route in baseline['routes']
+             for problem in regressions(route, result, baseline['routes'][route], args.tolerance)]
+    if found:
+        sys.exit('FAIL: regressions against the baseline:\n  ' + '\n  '.join(found))
+    print(f'OK: no route regressed by more than {args.tolerance:.0%}')
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,13 @@
+# benchmarks/synthetic.py
+"""Synthetic league data shared by the benchmarks"""
+
+POSITIONS = ['PG', 'SG', 'SF', 'PF', 'C']
+
+def insert_players(conn, n_players, teams, rng):
+    """Insert players 1..n_players on random `teams` with random averages; the caller commits"""
+    conn.executemany(
+        'INSERT INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        ((i, f'Player {i}', rng.choice(teams), rng.choice(POSITIONS),
+          round(rng.uniform(0, 35), 1), round(rng.uniform(0, 15), 1),
+          round(rng.uniform(0, 12), 1), round(rng.uniform(35, 65), 1))
+         for i in range(1, n_players + 1)))
@@ -1,141 +1,1906 @@
 # nba_web_app.py
-from flask import Flask, render_template_string, request, jsonify
+from flask import (Flask, Response, abort, g, render_template, request, jsonify, send_file,
+                   url_for, stream_with_context)
 import sqlite3
+import os
+import re
 import json
-import pandas as pd
-import numpy as np
-from datetime import datetime
-import matplotlib
-matplotlib.use('Agg')
-import matplotlib.pyplot as plt
+from datetime import date, datetime, timezone
 import io
+import html
+import math
+import gzip
+import itertools
+import time
+import sys
+import random
+import bisect
+import cProfile
+import tempfile
+import shutil
+import asyncio
+import atexit
+import csv
+import zlib
 import base64
+import click
+import hashlib
+import threading
+import unicodedata
+import difflib
+from concurrent.futures import ThreadPoolExecutor
+from collections import OrderedDict, namedtuple
+from contextlib import contextmanager
+from urllib.parse import parse_qsl
+from werkzeug.http import parse_etags
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+# pandas, NumPy and matplotlib are imported inside the functions that use them,
+# so worker start-up (and workers that only serve JSON) never pays for them.
+# benchmarks/bench_import_time.py guards this.
 
 app = Flask(__name__)
+app.config['DATABASE'] = os.environ.get(
+    'NBA_DATABASE', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'nba_sample.db'))
+# Sent with every /api response. The default lets browsers and proxies store
+# responses but revalidate each time, which the ETag turns into a cheap 304.
+app.config['API_CACHE_CONTROL'] = os.environ.get('NBA_API_CACHE_CONTROL', 'public, no-cache')
+
+# Applied to every connection. WAL lets readers proceed while a writer commits;
+# negative cache_size is in KiB.
+SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -20000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    # Wait (ms) for another worker's write lock instead of failing with
+    # "database is locked".
+    'busy_timeout': 5000,
+}
+
+# Seasons. The main database holds the current season; every other season
+# lives in its own file with the same schema under seasons_dir()
+# (nba_sample.db -> nba_sample-seasons/2023-24.db), opened only when a request
+# names it with ?season=. Current-season tables so stay the size of one season
+# however much history is loaded, and archived seasons get a small page cache
+# of their own instead of competing with it. `flask archive-season` rolls the
+# main database over to a new season; ingest-games files each game under the
+# season its date falls in.
+app.config['CURRENT_SEASON'] = os.environ.get('NBA_CURRENT_SEASON')
+app.config['SEASONS_DIR'] = os.environ.get('NBA_SEASONS_DIR')
+SEASON_START_MONTH = 7
+SEASON_NAME = re.compile(r'^(\d{4})-(\d{2})$')
+ARCHIVE_CACHE_KIB = 2000
+
+def season_for_date(day):
+    """The season ('2023-24') an ISO date falls in; seasons start in SEASON_START_MONTH"""
+    year, month = int(day[:4]), int(day[5:7])
+    start = year if month >= SEASON_START_MONTH else year - 1
+    return f'{start}-{(start + 1) % 100:02d}'
+
+def next_season(season):
+    start = int(season[:4]) + 1
+    return f'{start}-{(start + 1) % 100:02d}'
+
+def valid_season(season):
+    match = SEASON_NAME.match(season)
+    return bool(match) and (int(match[1]) + 1) % 100 == int(match[2])
+
+def current_season(conn=None):
+    """Name of the season in the main database: its current_season setting, read from `conn` if given
+
+    None until init_current_season() has recorded it.
+    """
+    if conn is not None:
+        row = conn.execute("SELECT value FROM settings WHERE name = 'current_season'").fetchone()
+        return row[0] if row else None
+    return runtime_settings().get('current_season')
+
+def init_current_season(conn):
+    """Record the main database's season if it has none yet and return it; the caller commits
+
+    That is NBA_CURRENT_SEASON, else the season today falls in. Once stored it
+    only changes through archive-season or seasons --current, never with the
+    clock.
+    """
+    conn.execute("INSERT OR IGNORE INTO settings (name, value) VALUES ('current_season', ?)",
+                 (app.config['CURRENT_SEASON'] or season_for_date(date.today().isoformat()),))
+    return current_season(conn)
+
+def seasons_dir():
+    return app.config['SEASONS_DIR'] or os.path.splitext(app.config['DATABASE'])[0] + '-seasons'
+
+def season_database(season=None):
+    """Path of `season`'s database; None is the current season, in the main database"""
+    return app.config['DATABASE'] if season is None else os.path.join(seasons_dir(), f'{season}.db')
+
+# Archived season names, re-listed only when the directory's mtime moves
+_archived_seasons = {'key': None, 'seasons': ()}
+
+def available_seasons():
+    """Every season with data: the current one, then the archived ones newest first"""
+    current = current_season()
+    directory = seasons_dir()
+    try:
+        key = (directory, os.stat(directory).st_mtime_ns)
+    except FileNotFoundError:
+        key = (directory, None)
+    if _archived_seasons['key'] != key:
+        names = os.listdir(directory) if key[1] is not None else []
+        _archived_seasons['seasons'] = sorted(
+            {name[:-3] for name in names if name.endswith('.db') and valid_season(name[:-3])}, reverse=True)
+        _archived_seasons['key'] = key
+    archived = [season for season in _archived_seasons['seasons'] if season != current]
+    return [current] + archived if current else archived
+
+def resolve_season(season):
+    """None for the current season (or no season), else the archived `season`
+
+    Raises ValueError for a malformed name and LookupError for a season
+    without a database.
+    """
+    if not season or season == current_season():
+        return None
+    if not valid_season(season):
+        raise ValueError(f'season must look like 2023-24, not {season}')
+    if not os.path.exists(season_database(season)):
+        raise LookupError(f'unknown season: {season}')
+    return season
+
+# One long-lived connection per thread and database, keyed by (thread id,
+# path). Connections belonging to threads that have exited are closed on the
+# next miss.
+_db_connections = {}
+_db_lock = threading.Lock()
+_db_stats = {'hits': 0, 'misses': 0, 'closed': 0}
+
+def connect_db(path=None):
+    """Open a new connection to the configured database with SQLITE_PRAGMAS applied"""
+    conn = sqlite3.connect(path or app.config['DATABASE'], check_same_thread=False)
+    for pragma, value in SQLITE_PRAGMAS.items():
+        conn.execute(f'PRAGMA {pragma} = {value}')
+    return conn
+
+def database_path(conn):
+    return conn.execute('PRAGMA database_list').fetchone()[2]
+
+def get_db(season=None):
+    """Return the calling thread's pooled connection to `season`'s database, opening it on first use"""
+    path = season_database(season)
+    key = (threading.get_ident(), path)
+    entry = _db_connections.get(key)
+    # Thread ids are reused, so the entry may belong to an exited thread whose
+    # connection the reaper below is about to close; only reuse our own.
+    if entry is not None and entry[0] is threading.current_thread():
+        with _db_lock:
+            _db_stats['hits'] += 1
+        return entry[1]
+
+    conn = connect_db(path)
+    if season is not None:
+        conn.execute(f'PRAGMA cache_size = -{ARCHIVE_CACHE_KIB}')
+    with _db_lock:
+        _db_stats['misses'] += 1
+        stale = [other for other, (thread, _) in _db_connections.items()
+                 if not thread.is_alive() or other == key]
+        for other in stale:
+            _db_connections.pop(other)[1].close()
+            _db_stats['closed'] += 1
+        _db_connections[key] = (threading.current_thread(), conn)
+    return conn
+
+def close_all_db():
+    with _db_lock:
+        for _, conn in _db_connections.values():
+            conn.close()
+            _db_stats['closed'] += 1
+        _db_connections.clear()
+
+def db_stats():
+    """Connection pool counters: reuse hits, new connections and currently open"""
+    with _db_lock:
+        return dict(_db_stats, open=len(_db_connections))
+
+# Latency histograms, exported on /metrics: {(metric, label): per-bucket
+# counts (the last for +Inf) followed by the sum of observed seconds}.
+HISTOGRAM_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+_histograms = {}
+_histograms_lock = threading.Lock()
+
+def observe(metric, label, seconds):
+    with _histograms_lock:
+        counts = _histograms.get((metric, label))
+        if counts is None:
+            counts = _histograms[(metric, label)] = [0] * (len(HISTOGRAM_BUCKETS) + 2)
+        counts[bisect.bisect_left(HISTOGRAM_BUCKETS, seconds)] += 1
+        counts[-1] += seconds
+
+@contextmanager
+def span(name):
+    """Time the block into the nba_span_seconds histogram as span `name`"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe('nba_span_seconds', name, time.perf_counter() - start)
+
+# Per-team aggregates over all games, one row per (team, games, wins, ...).
+STANDINGS_FROM_GAMES_SQL = '''
+    SELECT team, COUNT(*) AS games, SUM(won) AS wins, SUM(lost) AS losses,
+           SUM(scored) AS points_for, SUM(allowed) AS points_against
+    FROM (
+        SELECT home_team AS team, home_score > away_score AS won, home_score < away_score AS lost,
+               home_score AS scored, away_score AS allowed FROM games
+        UNION ALL
+        SELECT away_team, away_score > home_score, away_score < home_score,
+               away_score, home_score FROM games
+    )
+    GROUP BY team
+'''
+
+# Copies standings onto the matching teams rows, for the teams named in `names`
+# (a SQL expression yielding team names).
+SYNC_TEAMS_FROM_STANDINGS_SQL = '''
+    UPDATE teams SET
+        wins = (SELECT wins FROM standings WHERE team = teams.name),
+        losses = (SELECT losses FROM standings WHERE team = teams.name),
+        ppg = (SELECT COALESCE(ROUND(points_for * 1.0 / NULLIF(games, 0), 1), 0)
+               FROM standings WHERE team = teams.name),
+        opp_ppg = (SELECT COALESCE(ROUND(points_against * 1.0 / NULLIF(games, 0), 1), 0)
+                   FROM standings WHERE team = teams.name)
+    WHERE name IN ({names});
+'''
+
+def _standings_delta_sql(row, sign):
+    """Statements adding (sign=+1) or removing (sign=-1) game `row` from standings"""
+    statements = []
+    for team, scored, allowed in (('home_team', 'home_score', 'away_score'),
+                                  ('away_team', 'away_score', 'home_score')):
+        statements.append(f'''
+        INSERT INTO standings (team, games, wins, losses, points_for, points_against)
+        VALUES ({row}.{team}, {sign}, {sign} * ({row}.{scored} > {row}.{allowed}),
+                {sign} * ({row}.{scored} < {row}.{allowed}), {sign} * {row}.{scored}, {sign} * {row}.{allowed})
+        ON CONFLICT (team) DO UPDATE SET
+            games = games + excluded.games, wins = wins + excluded.wins,
+            losses = losses + excluded.losses, points_for = points_for + excluded.points_for,
+            points_against = points_against + excluded.points_against;''')
+    statements.append(SYNC_TEAMS_FROM_STANDINGS_SQL.format(
+        names=f'{row}.home_team, {row}.away_team'))
+    return ''.join(statements)
+
+# Head-to-head aggregates over all games, one row per (team_id, opponent_id).
+HEAD_TO_HEAD_FROM_GAMES_SQL = '''
+    SELECT team_id, opponent_id, COUNT(*) AS games, SUM(won) AS wins, SUM(lost) AS losses,
+           SUM(scored) AS points_for, SUM(allowed) AS points_against
+    FROM (
+        SELECT home_team_id AS team_id, away_team_id AS opponent_id,
+               home_score > away_score AS won, home_score < away_score AS lost,
+               home_score AS scored, away_score AS allowed FROM games
+        UNION ALL
+        SELECT away_team_id, home_team_id, away_score > home_score, away_score < home_score,
+               away_score, home_score FROM games
+    )
+    GROUP BY team_id, opponent_id
+'''
+
+# Gives every team named in games a teams row and fills in the games' team ids.
+NORMALIZE_GAMES_SQL = '''
+    INSERT INTO teams (name, wins, losses, ppg, opp_ppg)
+    SELECT name, 0, 0, 0, 0 FROM (SELECT home_team AS name FROM games UNION SELECT away_team FROM games)
+    WHERE name NOT IN (SELECT name FROM teams);
+
+    UPDATE games SET
+        home_team_id = (SELECT id FROM teams WHERE name = games.home_team),
+        away_team_id = (SELECT id FROM teams WHERE name = games.away_team)
+    WHERE home_team_id IS NULL OR away_team_id IS NULL;
+'''
+
+def _normalize_game_sql(row):
+    """Statements giving `row`'s teams a teams row and setting its team ids"""
+    statements = [f'''
+        INSERT INTO teams (name, wins, losses, ppg, opp_ppg)
+        SELECT {row}.{team}, 0, 0, 0, 0 WHERE NOT EXISTS (SELECT 1 FROM teams WHERE name = {row}.{team});'''
+        for team in ('home_team', 'away_team')]
+    statements.append(f'''
+        UPDATE games SET
+            home_team_id = (SELECT id FROM teams WHERE name = {row}.home_team),
+            away_team_id = (SELECT id FROM teams WHERE name = {row}.away_team)
+        WHERE id = {row}.id;''')
+    # The standings trigger may have run before a new team's row existed
+    statements.append(SYNC_TEAMS_FROM_STANDINGS_SQL.format(
+        names=f'{row}.home_team, {row}.away_team'))
+    return ''.join(statements)
+
+def _head_to_head_delta_sql(row, sign, home_id, away_id):
+    """Statements adding (sign=+1) or removing (sign=-1) game `row` from head_to_head"""
+    return ''.join(f'''
+        INSERT INTO head_to_head (team_id, opponent_id, games, wins, losses, points_for, points_against)
+        VALUES ({team_id}, {opponent_id}, {sign}, {sign} * ({row}.{scored} > {row}.{allowed}),
+                {sign} * ({row}.{scored} < {row}.{allowed}), {sign} * {row}.{scored}, {sign} * {row}.{allowed})
+        ON CONFLICT (team_id, opponent_id) DO UPDATE SET
+            games = games + excluded.games, wins = wins + excluded.wins,
+            losses = losses + excluded.losses, points_for = points_for + excluded.points_for,
+            points_against = points_against + excluded.points_against;'''
+        for team_id, opponent_id, scored, allowed in ((home_id, away_id, 'home_score', 'away_score'),
+                                                       (away_id, home_id, 'away_score', 'home_score')))
+
+_NEW_HOME_ID = '(SELECT id FROM teams WHERE name = NEW.home_team)'
+_NEW_AWAY_ID = '(SELECT id FROM teams WHERE name = NEW.away_team)'
+
+def _search_index_sql(table):
+    """An FTS5 index over `table`.name, its vocabulary, and the triggers keeping it in sync
+
+    Tokens are case- and diacritic-folded ("Jokić" indexes as "jokic") and
+    prefixes of up to three characters are indexed for autocomplete. The
+    index stores no text of its own; rows are looked up in `table` by id.
+    """
+    return f'''
+    CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts USING fts5(
+        name, content='{table}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2', prefix='1 2 3');
+    CREATE VIRTUAL TABLE IF NOT EXISTS {table}_fts_terms USING fts5vocab({table}_fts, 'row');
+    INSERT INTO {table}_fts ({table}_fts) VALUES ('rebuild');
+
+    CREATE TRIGGER IF NOT EXISTS {table}_insert_search AFTER INSERT ON {table}
+    BEGIN
+        INSERT INTO {table}_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS {table}_delete_search AFTER DELETE ON {table}
+    BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS {table}_update_search AFTER UPDATE OF id, name ON {table}
+    BEGIN
+        INSERT INTO {table}_fts ({table}_fts, rowid, name) VALUES ('delete', OLD.id, OLD.name);
+        INSERT INTO {table}_fts (rowid, name) VALUES (NEW.id, NEW.name);
+    END;
+    '''
+
+# Schema migrations, applied in order and tracked with PRAGMA user_version.
+# Append new entries; never edit one that has already shipped.
+SCHEMA_MIGRATIONS = [
+    # 1: base tables
+    '''
+    CREATE TABLE IF NOT EXISTS teams (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        conference TEXT,
+        wins INTEGER,
+        losses INTEGER,
+        ppg REAL,
+        opp_ppg REAL
+    );
+
+    CREATE TABLE IF NOT EXISTS players (
+        id INTEGER PRIMARY KEY,
+        name TEXT NOT NULL,
+        team TEXT,
+        position TEXT,
+        ppg REAL,
+        rpg REAL,
+        apg REAL,
+        fg_pct REAL
+    );
+
+    CREATE TABLE IF NOT EXISTS games (
+        id INTEGER PRIMARY KEY,
+        date TEXT,
+        home_team TEXT,
+        away_team TEXT,
+        home_score INTEGER,
+        away_score INTEGER
+    );
+    ''',
+    # 2: per-table change counters, bumped by triggers on every write
+    '''
+    CREATE TABLE IF NOT EXISTS data_version (
+        table_name TEXT PRIMARY KEY,
+        version INTEGER NOT NULL DEFAULT 0
+    );
+
+    INSERT OR IGNORE INTO data_version (table_name) VALUES ('teams'), ('players'), ('games');
+    ''' + ''.join(f'''
+    CREATE TRIGGER IF NOT EXISTS {table}_{event.lower()}_version AFTER {event} ON {table}
+    BEGIN
+        UPDATE data_version SET version = version + 1 WHERE table_name = '{table}';
+    END;
+    ''' for table in ('teams', 'players', 'games') for event in ('INSERT', 'UPDATE', 'DELETE')),
+    # 3: indexes backing the /api filters; (column, id) keeps keyset pages in index order
+    '''
+    CREATE INDEX IF NOT EXISTS idx_players_team ON players (team, id);
+    CREATE INDEX IF NOT EXISTS idx_players_position ON players (position, id);
+    CREATE INDEX IF NOT EXISTS idx_players_ppg ON players (ppg);
+    CREATE INDEX IF NOT EXISTS idx_teams_conference ON teams (conference, id);
+    ''',
+    # 4: natural key for games, so ingestion can upsert box scores without ids
+    '''
+    CREATE UNIQUE INDEX IF NOT EXISTS idx_games_natural_key ON games (date, home_team, away_team);
+    ''',
+    # 5: standings materialized from games, kept current by triggers that touch
+    # only the two teams in each game; teams with games get their record from it
+    '''
+    CREATE TABLE IF NOT EXISTS standings (
+        team TEXT PRIMARY KEY,
+        games INTEGER NOT NULL DEFAULT 0,
+        wins INTEGER NOT NULL DEFAULT 0,
+        losses INTEGER NOT NULL DEFAULT 0,
+        points_for INTEGER NOT NULL DEFAULT 0,
+        points_against INTEGER NOT NULL DEFAULT 0
+    );
+
+    CREATE INDEX IF NOT EXISTS idx_teams_name ON teams (name);
+
+    CREATE TRIGGER IF NOT EXISTS games_insert_standings AFTER INSERT ON games
+    BEGIN''' + _standings_delta_sql('NEW', 1) + '''
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS games_delete_standings AFTER DELETE ON games
+    BEGIN''' + _standings_delta_sql('OLD', -1) + '''
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS games_update_standings
+    AFTER UPDATE OF home_team, away_team, home_score, away_score ON games
+    BEGIN''' + _standings_delta_sql('OLD', -1) + _standings_delta_sql('NEW', 1) + '''
+    END;
+
+    INSERT OR REPLACE INTO standings ''' + STANDINGS_FROM_GAMES_SQL + ''';
+    ''' + SYNC_TEAMS_FROM_STANDINGS_SQL.format(names='SELECT team FROM standings'),
+    # 6: integer team ids on games, date and matchup indexes, and a head-to-head
+    # matrix maintained per game like standings. Team names stay on games as
+    # the natural key used by ingestion.
+    '''
+    ALTER TABLE games ADD COLUMN home_team_id INTEGER REFERENCES teams (id);
+    ALTER TABLE games ADD COLUMN away_team_id INTEGER REFERENCES teams (id);
+
+    CREATE INDEX IF NOT EXISTS idx_games_date ON games (date);
+    CREATE INDEX IF NOT EXISTS idx_games_home_matchup ON games (home_team_id, away_team_id, date);
+    CREATE INDEX IF NOT EXISTS idx_games_away_team ON games (away_team_id, date);
+
+    CREATE TABLE IF NOT EXISTS head_to_head (
+        team_id INTEGER NOT NULL REFERENCES teams (id),
+        opponent_id INTEGER NOT NULL REFERENCES teams (id),
+        games INTEGER NOT NULL DEFAULT 0,
+        wins INTEGER NOT NULL DEFAULT 0,
+        losses INTEGER NOT NULL DEFAULT 0,
+        points_for INTEGER NOT NULL DEFAULT 0,
+        points_against INTEGER NOT NULL DEFAULT 0,
+        PRIMARY KEY (team_id, opponent_id)
+    ) WITHOUT ROWID;
+    ''' + NORMALIZE_GAMES_SQL + SYNC_TEAMS_FROM_STANDINGS_SQL.format(names='SELECT team FROM standings')
+    + '''
+    INSERT INTO head_to_head ''' + HEAD_TO_HEAD_FROM_GAMES_SQL + ''';
+
+    CREATE TRIGGER IF NOT EXISTS games_insert_head_to_head AFTER INSERT ON games
+    BEGIN''' + _normalize_game_sql('NEW')
+    + _head_to_head_delta_sql('NEW', 1, _NEW_HOME_ID, _NEW_AWAY_ID) + '''
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS games_delete_head_to_head AFTER DELETE ON games
+    BEGIN''' + _head_to_head_delta_sql('OLD', -1, 'OLD.home_team_id', 'OLD.away_team_id') + '''
+    END;
+
+    CREATE TRIGGER IF NOT EXISTS games_update_head_to_head
+    AFTER UPDATE OF home_team, away_team, home_score, away_score ON games
+    BEGIN''' + _head_to_head_delta_sql('OLD', -1, 'OLD.home_team_id', 'OLD.away_team_id')
+    + _normalize_game_sql('NEW') + _head_to_head_delta_sql('NEW', 1, _NEW_HOME_ID, _NEW_AWAY_ID) + '''
+    END;
+    ''',
+    # 7: runtime settings shared by every worker, e.g. the profiler sample rate
+    '''
+    CREATE TABLE IF NOT EXISTS settings (
+        name TEXT PRIMARY KEY,
+        value TEXT NOT NULL
+    );
+    ''',
+    # 8: full-text search indexes over player and team names
+    _search_index_sql('players') + _search_index_sql('teams'),
+]
 
 # Sample NBA Data
-def init_sample_data():
-    conn = sqlite3.connect('nba_sample.db')
-    cursor = conn.cursor()
-    
-    # Create tables
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS teams (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            conference TEXT,
-            wins INTEGER,
-            losses INTEGER,
-            ppg REAL,
-            opp_ppg REAL
+SAMPLE_TEAMS = [
+    (1, 'Los Angeles Lakers', 'West', 42, 30, 115.6, 112.3),
+    (2, 'Golden State Warriors', 'West', 38, 34, 118.3, 115.8),
+    (3, 'Boston Celtics', 'East', 57, 15, 121.1, 109.8),
+    (4, 'Chicago Bulls', 'East', 34, 38, 111.8, 113.5),
+    (5, 'Miami Heat', 'East', 40, 32, 113.4, 111.2),
+    (6, 'Denver Nuggets', 'West', 52, 20, 117.5, 112.9),
+    (7, 'Phoenix Suns', 'West', 44, 28, 116.8, 113.1),
+    (8, 'Milwaukee Bucks', 'East', 48, 24, 119.3, 114.6)
+]
+
+SAMPLE_PLAYERS = [
+    (1, 'LeBron James', 'Los Angeles Lakers', 'SF', 25.3, 7.3, 8.3, 53.5),
+    (2, 'Stephen Curry', 'Golden State Warriors', 'PG', 27.5, 4.3, 5.2, 45.3),
+    (3, 'Giannis Antetokounmpo', 'Milwaukee Bucks', 'PF', 30.8, 11.5, 6.4, 61.3),
+    (4, 'Kevin Durant', 'Phoenix Suns', 'SF', 27.6, 6.8, 5.2, 52.9),
+    (5, 'Luka Dončić', 'Dallas Mavericks', 'PG', 34.1, 9.0, 9.8, 49.2),
+    (6, 'Jayson Tatum', 'Boston Celtics', 'SF', 27.2, 8.3, 4.9, 47.1),
+    (7, 'Nikola Jokić', 'Denver Nuggets', 'C', 26.4, 12.4, 9.0, 58.3),
+    (8, 'Joel Embiid', 'Philadelphia 76ers', 'C', 35.3, 11.3, 5.7, 53.7)
+]
+
+def get_schema_version(conn):
+    return conn.execute('PRAGMA user_version').fetchone()[0]
+
+def migrate_db(conn):
+    """Apply any pending schema migrations, each in its own transaction"""
+    version = get_schema_version(conn)
+    for target in range(version + 1, len(SCHEMA_MIGRATIONS) + 1):
+        # executescript() commits implicitly, so BEGIN/COMMIT are spelled out
+        # to keep the DDL and the version bump atomic.
+        conn.executescript(
+            'BEGIN;\n'
+            + SCHEMA_MIGRATIONS[target - 1]
+            + f'\nPRAGMA user_version = {target};\nCOMMIT;'
         )
-    ''')
+    repair_schema(conn)
+    return get_schema_version(conn)
+
+SCHEMA_OBJECT = re.compile(r'CREATE (?:UNIQUE )?(?:INDEX|TRIGGER) IF NOT EXISTS (\w+)')
+
+def _schema_objects():
+    """[(name, sql)] of every index and trigger the migrations create"""
+    objects, pending = [], ''
+    for migration in SCHEMA_MIGRATIONS:
+        for piece in migration.split(';'):
+            pending += piece + ';'
+            if sqlite3.complete_statement(pending):
+                match = SCHEMA_OBJECT.match(pending.strip())
+                if match:
+                    objects.append((match[1], pending.strip()))
+                pending = ''
+    return objects
+
+def _schema_object_names(conn):
+    return {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type IN ('index', 'trigger')")}
+
+def repair_schema(conn):
+    """Re-create any migration index or trigger that is missing; returns their names
+
+    ingest_games and archive_season drop the games indexes and triggers while
+    they work, and a process killed mid-way never puts them back. The tables
+    those triggers maintain are then rebuilt from games, with a version bump.
+    """
+    existing = _schema_object_names(conn)
+    missing = [(name, sql) for name, sql in _schema_objects() if name not in existing]
+    if missing:
+        with conn:
+            conn.execute('BEGIN')
+            for _, sql in missing:
+                conn.execute(sql)
+            conn.execute("UPDATE data_version SET version = version + 1 WHERE table_name = 'games'")
+            rebuild_derived_tables(conn)
+    return [name for name, _ in missing]
+
+def init_sample_data(conn):
+    """Seed the sample teams and players once; no-op if data already exists"""
+    if conn.execute('SELECT 1 FROM teams LIMIT 1').fetchone() is None:
+        conn.executemany('INSERT OR IGNORE INTO teams VALUES (?, ?, ?, ?, ?, ?, ?)', SAMPLE_TEAMS)
+    if conn.execute('SELECT 1 FROM players LIMIT 1').fetchone() is None:
+        conn.executemany('INSERT OR IGNORE INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?)', SAMPLE_PLAYERS)
+    conn.commit()
+
+def init_db(seed=True):
+    """Run migrations (and optionally seed) once at startup, never per request"""
+    conn = connect_db()
+    try:
+        version = migrate_db(conn)
+        with conn:
+            init_current_season(conn)
+        if seed:
+            init_sample_data(conn)
+    finally:
+        conn.close()
+    return version
+
+@app.cli.command('init-db')
+@click.option('--no-seed', is_flag=True, help='Only apply schema migrations.')
+def init_db_command(no_seed):
+    """Apply schema migrations and seed the sample data."""
+    version = init_db(seed=not no_seed)
+    click.echo(f'Database at schema version {version}')
+
+GAME_COLUMNS = ('date', 'home_team', 'away_team', 'home_score', 'away_score')
+INGEST_BATCH_ROWS = 20000
+
+def _open_text(path):
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+def iso_date(value):
+    """Normalize a game date (ISO date/datetime or MM/DD/YYYY) to YYYY-MM-DD"""
+    value = str(value).strip()
+    try:
+        return date.fromisoformat(value[:10]).isoformat()
+    except ValueError:
+        return datetime.strptime(value, '%m/%d/%Y').date().isoformat()
+
+def iter_game_records(path):
+    """Yield game tuples in GAME_COLUMNS order from a CSV, NDJSON/JSONL or JSON-array file
+
+    CSV and NDJSON are read a line at a time; a .json array is parsed whole.
+    Any of them may be gzip-compressed (.gz).
+    """
+    kind = path[:-3] if path.endswith('.gz') else path
+    with _open_text(path) as f:
+        if kind.endswith('.csv'):
+            records = csv.DictReader(f)
+            missing = set(GAME_COLUMNS) - set(records.fieldnames or ())
+            if missing:
+                raise ValueError(f'{path}: missing columns {", ".join(sorted(missing))}')
+        elif kind.endswith(('.ndjson', '.jsonl')):
+            records = (json.loads(line) for line in f if line.strip())
+        elif kind.endswith('.json'):
+            records = json.load(f)
+        else:
+            raise ValueError(f'{path}: expected a .csv, .ndjson, .jsonl or .json file')
+        for number, record in enumerate(records, start=1):
+            try:
+                yield (iso_date(record['date']), record['home_team'], record['away_team'],
+                       int(record['home_score']), int(record['away_score']))
+            except (KeyError, TypeError, ValueError) as e:
+                raise ValueError(f'{path}: bad record {number}: {e!r}') from e
+
+def _deferred_games_schema(conn):
+    """The games indexes and triggers that can be dropped for a bulk load
+
+    Unique indexes stay, since the upsert needs them to detect conflicts.
+    """
+    return conn.execute(
+        "SELECT type, name, sql FROM sqlite_master WHERE tbl_name = 'games' AND sql IS NOT NULL "
+        "AND (type = 'trigger' OR (type = 'index' AND sql NOT LIKE 'CREATE UNIQUE%'))"
+    ).fetchall()
+
+def copy_teams(source, conn):
+    """Add the teams of `source` that `conn`'s database lacks, keeping their ids; the caller commits
+
+    Team ids then mean the same team in every season's database.
+    """
+    conn.executemany(
+        'INSERT OR IGNORE INTO teams (id, name, conference, wins, losses, ppg, opp_ppg) '
+        'SELECT ?, ?, ?, 0, 0, 0, 0 WHERE NOT EXISTS (SELECT 1 FROM teams WHERE name = ?)',
+        ((id_, name, conference, name)
+         for id_, name, conference in source.execute('SELECT id, name, conference FROM teams')))
+
+def _restore_deferred_schema(conn, deferred):
+    """Re-create the dropped `deferred` objects, except any repair_schema() already put back"""
+    existing = _schema_object_names(conn)
+    for _, name, sql in deferred:
+        if name not in existing:
+            conn.execute(sql)
+
+def ingest_games(paths, batch_size=INGEST_BATCH_ROWS):
+    """Upsert games from `paths` in batched transactions; returns (rows, seconds)
+
+    Each game goes to the database of the season its date falls in: the main
+    one for the current season, else that earlier season's file, created on
+    first use and given the main database's teams first. A game dated after
+    the current season is rejected; archive the current season first. The
+    non-unique indexes and all triggers on games are dropped for the load and
+    recreated afterwards, with a single version bump per database.
+    """
+    upsert = (
+        'INSERT INTO games (date, home_team, away_team, home_score, away_score) '
+        'VALUES (?, ?, ?, ?, ?) '
+        'ON CONFLICT (date, home_team, away_team) DO UPDATE SET '
+        'home_score = excluded.home_score, away_score = excluded.away_score'
+    )
+    main = connect_db()
+    migrate_db(main)
+    with main:
+        current = init_current_season(main)
+    start = time.perf_counter()
+    total = 0
+    # season -> (connection, deferred schema), for the databases written so far
+    targets = {}
+
+    def target(season):
+        if season not in targets:
+            if season == current:
+                conn = main
+            else:
+                os.makedirs(seasons_dir(), exist_ok=True)
+                conn = connect_db(season_database(season))
+                migrate_db(conn)
+                copy_teams(main, conn)
+            deferred = _deferred_games_schema(conn)
+            targets[season] = (conn, deferred)
+            for kind, name, _ in deferred:
+                conn.execute(f'DROP {kind.upper()} IF EXISTS {name}')
+            conn.commit()
+        return targets[season][0]
+
+    try:
+        for path in paths:
+            records = iter_game_records(path)
+            while True:
+                batch = list(itertools.islice(records, batch_size))
+                if not batch:
+                    break
+                by_season = {}
+                for game in batch:
+                    by_season.setdefault(season_for_date(game[0]), []).append(game)
+                later = sorted(season for season in by_season if season > current)
+                if later:
+                    raise ValueError(f'{path}: games in {", ".join(later)} are after the current '
+                                     f'season {current}; run archive-season first')
+                for season, games in by_season.items():
+                    conn = target(season)
+                    with conn:
+                        conn.executemany(upsert, games)
+                total += len(batch)
+    finally:
+        for conn, deferred in targets.values():
+            with conn:
+                _restore_deferred_schema(conn, deferred)
+                conn.execute("UPDATE data_version SET version = version + 1 WHERE table_name = 'games'")
+                # The per-game triggers were dropped with the rest, so rebuild in one pass
+                rebuild_derived_tables(conn)
+            if conn is not main:
+                conn.close()
+        main.close()
+    return total, time.perf_counter() - start
+
+@app.cli.command('ingest-games')
+@click.argument('paths', nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+@click.option('--batch-size', default=INGEST_BATCH_ROWS, show_default=True,
+              help='Rows per transaction.')
+def ingest_games_command(paths, batch_size):
+    """Bulk-load game results from CSV/NDJSON/JSON files."""
+    try:
+        rows, seconds = ingest_games(paths, batch_size)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Loaded {rows} games in {seconds:.2f}s ({rows / max(seconds, 1e-9):,.0f} rows/s)')
+
+def rebuild_standings(conn):
+    """Recompute standings from every game and resync teams; the caller commits"""
+    conn.execute('DELETE FROM standings')
+    conn.execute('INSERT INTO standings ' + STANDINGS_FROM_GAMES_SQL)
+    conn.execute(SYNC_TEAMS_FROM_STANDINGS_SQL.format(names='SELECT team FROM standings'))
+
+def rebuild_derived_tables(conn):
+    """Fill in team ids and recompute standings and head_to_head; the caller commits"""
+    for statement in NORMALIZE_GAMES_SQL.split(';'):
+        if statement.strip():
+            conn.execute(statement)
+    rebuild_standings(conn)
+    conn.execute('DELETE FROM head_to_head')
+    conn.execute('INSERT INTO head_to_head ' + HEAD_TO_HEAD_FROM_GAMES_SQL)
+
+def verify_standings(conn):
+    """Diff the incrementally maintained standings against a full recompute
+
+    Returns a list of (team, column, stored, expected); empty when consistent.
+    Teams rows and the head_to_head matrix are checked against the recompute too.
+    """
+    columns = ('games', 'wins', 'losses', 'points_for', 'points_against')
+    expected = {row[0]: row[1:] for row in conn.execute(STANDINGS_FROM_GAMES_SQL)}
+    stored = {row[0]: row[1:] for row in conn.execute(
+        f'SELECT team, {", ".join(columns)} FROM standings WHERE games != 0')}
+
+    diffs = []
+    for team in sorted(expected.keys() | stored.keys()):
+        have = stored.get(team, (None,) * len(columns))
+        want = expected.get(team, (None,) * len(columns))
+        diffs.extend((team, column, h, w) for column, h, w in zip(columns, have, want) if h != w)
+    for name, wins, losses in conn.execute('SELECT name, wins, losses FROM teams'):
+        if name in expected:
+            want_wins, want_losses = expected[name][1:3]
+            if (wins, losses) != (want_wins, want_losses):
+                diffs.append((name, 'teams.wins-losses', f'{wins}-{losses}', f'{want_wins}-{want_losses}'))
+
+    expected = {row[:2]: row[2:] for row in conn.execute(HEAD_TO_HEAD_FROM_GAMES_SQL)}
+    stored = {row[:2]: row[2:] for row in conn.execute(
+        f'SELECT team_id, opponent_id, {", ".join(columns)} FROM head_to_head WHERE games != 0')}
+    for pair in sorted(expected.keys() | stored.keys()):
+        have = stored.get(pair, (None,) * len(columns))
+        want = expected.get(pair, (None,) * len(columns))
+        diffs.extend((f'team {pair[0]} vs {pair[1]}', f'head_to_head.{column}', h, w)
+                     for column, h, w in zip(columns, have, want) if h != w)
+    return diffs
+
+@app.cli.command('verify-standings')
+@click.option('--fix', is_flag=True, help='Rebuild standings from games if they differ.')
+def verify_standings_command(fix):
+    """Recompute standings from games and report any drift."""
+    conn = connect_db()
+    try:
+        diffs = verify_standings(conn)
+        for team, column, stored, expected in diffs:
+            click.echo(f'{team}: {column} is {stored}, expected {expected}')
+        if diffs and fix:
+            with conn:
+                rebuild_derived_tables(conn)
+            click.echo('Standings rebuilt from games.')
+        elif not diffs:
+            click.echo('Standings match games.')
+    finally:
+        conn.close()
+    if diffs and not fix:
+        raise SystemExit(1)
+
+def save_setting(conn, name, value):
+    """Store a runtime setting; running workers see it within SETTINGS_TTL seconds. The caller commits"""
+    conn.execute('INSERT INTO settings (name, value) VALUES (?, ?) '
+                 'ON CONFLICT (name) DO UPDATE SET value = excluded.value', (name, value))
+
+def archive_season(conn, new_season=None):
+    """Copy the main database to the current season's file and start `new_season` in it
+
+    Games, standings and head-to-head records are cleared; teams and players
+    keep their rows, with zeroed records and averages. Returns the archived
+    season's name.
+    """
+    season = current_season(conn)
+    new_season = new_season or next_season(season)
+    if not valid_season(new_season):
+        raise ValueError(f'season must look like 2023-24, not {new_season}')
+    if new_season == season or os.path.exists(season_database(new_season)):
+        raise ValueError(f'season {new_season} already has data')
+    target = season_database(season)
+    if os.path.exists(target):
+        raise ValueError(f'{season} is already archived in {target}')
+    os.makedirs(seasons_dir(), exist_ok=True)
+    conn.execute('VACUUM INTO ?', (target,))
+
+    deferred = _deferred_games_schema(conn)
+    for kind, name, _ in deferred:
+        conn.execute(f'DROP {kind.upper()} IF EXISTS {name}')
+    conn.commit()
+    with conn:
+        conn.execute('DELETE FROM games')
+        _restore_deferred_schema(conn, deferred)
+        conn.execute("UPDATE data_version SET version = version + 1 WHERE table_name = 'games'")
+        rebuild_derived_tables(conn)
+        conn.execute('UPDATE teams SET wins = 0, losses = 0, ppg = 0, opp_ppg = 0')
+        conn.execute('UPDATE players SET ppg = 0, rpg = 0, apg = 0, fg_pct = 0')
+        save_setting(conn, 'current_season', new_season)
+    # Give the freed pages back, so the current season's file stays small
+    conn.execute('VACUUM')
+    return season
+
+@app.cli.command('archive-season')
+@click.option('--next', 'new_season', help='Name of the new current season (default: the one after).')
+def archive_season_command(new_season):
+    """Move the current season into its own database and start the next one."""
+    conn = connect_db()
+    try:
+        migrate_db(conn)
+        with conn:
+            init_current_season(conn)
+        season = archive_season(conn, new_season)
+        click.echo(f'Archived {season} to {season_database(season)}; '
+                   f'the current season is now {current_season(conn)}')
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    finally:
+        conn.close()
+
+@app.cli.command('seasons')
+@click.option('--current', 'season', help='Rename the season held in the main database.')
+def seasons_command(season):
+    """List the seasons with data, or set the current season's name."""
+    conn = connect_db()
+    try:
+        migrate_db(conn)
+        if season:
+            if not valid_season(season):
+                raise click.ClickException(f'season must look like 2023-24, not {season}')
+            if season != current_season(conn) and os.path.exists(season_database(season)):
+                raise click.ClickException(f'season {season} is already archived')
+            with conn:
+                save_setting(conn, 'current_season', season)
+        with conn:
+            current = init_current_season(conn)
+    finally:
+        conn.close()
+    _settings['expires'] = 0.0
+    for name in available_seasons():
+        click.echo(f'{name}{" (current)" if name == current else ""}')
+
+def get_data_versions(conn=None):
+    """Return {table: change counter} for the tracked tables"""
+    return dict((conn or get_db()).execute('SELECT table_name, version FROM data_version'))
+
+# Rows plus a content hash, as fed to a chart's draw function.
+ChartData = namedtuple('ChartData', ['columns', 'rows', 'etag'])
+
+# Everything the dashboard page and its charts need, derived from one read of
+# each table of one season (None for the current one). `versions` are the
+# data_version counters the snapshot was built at.
+DashboardSnapshot = namedtuple('DashboardSnapshot', [
+    'season', 'versions', 'teams', 'players', 'total_teams', 'total_players',
+    'avg_ppg', 'best_team', 'chart_data',
+])
+
+# Snapshots by season, least recently used first
+SNAPSHOT_MAX_SEASONS = 4
+_snapshots = OrderedDict()
+_snapshot_lock = threading.Lock()
+
+def _chart_data(columns, rows):
+    return ChartData(columns, rows, hashlib.sha1(repr(rows).encode()).hexdigest())
+
+def _read_table(conn, query):
+    with span('db.snapshot'):
+        cursor = conn.execute(query)
+        columns = [col[0] for col in cursor.description]
+        return [dict(zip(columns, row)) for row in cursor]
+
+def _summarize_teams(conn):
+    teams = _read_table(conn, "SELECT * FROM teams ORDER BY wins DESC")
+    by_ppg = sorted(teams, key=lambda team: team['ppg'], reverse=True)
+    if teams:
+        avg_ppg = round(sum(team['ppg'] for team in teams) / len(teams), 1)
+        best = teams[0]
+        best_team = f"{best['name']} ({best['wins']}-{best['losses']})"
+    else:
+        avg_ppg, best_team = 0, 'N/A'
+    return {
+        'teams': teams,
+        'total_teams': len(teams),
+        'avg_ppg': avg_ppg,
+        'best_team': best_team,
+        'chart_data': {
+            'win-loss': _chart_data(['name', 'wins', 'losses'],
+                                    [(t['name'], t['wins'], t['losses']) for t in teams]),
+            'ppg': _chart_data(['name', 'ppg'], [(t['name'], t['ppg']) for t in by_ppg]),
+        },
+    }
+
+def _summarize_players(conn):
+    players = _read_table(conn, "SELECT * FROM players ORDER BY ppg DESC")
+    return {'players': players, 'total_players': len(players)}
+
+def get_dashboard_snapshot(season=None):
+    """Return `season`'s current DashboardSnapshot, rebuilding only the tables that changed"""
+    conn = get_db(season)
+    # Versions are read before the rows, so a concurrent write can only make
+    # a snapshot newer than its versions claim, never older.
+    versions = get_data_versions(conn)
+    with _snapshot_lock:
+        snapshot = _snapshots.get(season)
+        if snapshot is not None and snapshot.versions == versions:
+            _snapshots.move_to_end(season)
+            return snapshot
+
+        parts = {}
+        if snapshot is not None and snapshot.versions.get('teams') == versions['teams']:
+            parts.update((field, getattr(snapshot, field))
+                         for field in ('teams', 'total_teams', 'avg_ppg', 'best_team', 'chart_data'))
+        else:
+            parts.update(_summarize_teams(conn))
+        if snapshot is not None and snapshot.versions.get('players') == versions['players']:
+            parts.update(players=snapshot.players, total_players=snapshot.total_players)
+        else:
+            parts.update(_summarize_players(conn))
+
+        snapshot = _snapshots[season] = DashboardSnapshot(season=season, versions=versions, **parts)
+        _snapshots.move_to_end(season)
+        while len(_snapshots) > SNAPSHOT_MAX_SEASONS:
+            _snapshots.popitem(last=False)
+        return snapshot
+
+# Rendered charts, keyed by (chart name, hash of the rows drawn), so identical
+# data never goes through matplotlib twice. Least recently used entries are
+# evicted once the cache holds CHART_CACHE_MAX_ENTRIES charts.
+CHART_CACHE_MAX_ENTRIES = 32
+_chart_cache = OrderedDict()
+_chart_cache_lock = threading.Lock()
+chart_cache_stats = {'hits': 0, 'misses': 0, 'evictions': 0}
+
+# A rendered chart plus the validators used for HTTP caching: `etag` is the
+# hash of the rows drawn and `last_modified` is when that data was rendered.
+ChartImage = namedtuple('ChartImage', ['png', 'etag', 'last_modified'])
+
+def cached_chart(name, etag, count=True):
+    """The cached ChartImage for `name` drawn from data `etag`, or None
+
+    With count=False the lookup is left out of chart_cache_stats, for a
+    caller repeating a lookup that was already counted.
+    """
+    key = (name, etag)
+    with _chart_cache_lock:
+        chart = _chart_cache.get(key)
+        if chart is not None:
+            _chart_cache.move_to_end(key)
+        if count:
+            chart_cache_stats['hits' if chart is not None else 'misses'] += 1
+        return chart
+
+def render_chart(name, data, draw, counted=False):
+    """Return the ChartImage for chart `name`, drawing it only if its data changed
+
+    `counted` says the caller already looked the chart up, hit or miss.
+    """
+    etag = data.etag
+    key = (name, etag)
+    chart = cached_chart(name, etag, count=not counted)
+    if chart is not None:
+        return chart
+
+    with span(f'chart.png.{name}'):
+        png = draw(chart_columns(data))
+    chart = ChartImage(png, etag, datetime.now(timezone.utc).replace(microsecond=0))
+
+    with _chart_cache_lock:
+        _chart_cache[key] = chart
+        _chart_cache.move_to_end(key)
+        while len(_chart_cache) > CHART_CACHE_MAX_ENTRIES:
+            _chart_cache.popitem(last=False)
+            chart_cache_stats['evictions'] += 1
+    return chart
+
+def chart_columns(data):
+    """ChartData as {column: list of values}, the input to the draw functions"""
+    return {column: [row[i] for row in data.rows] for i, column in enumerate(data.columns)}
+
+# Charts are drawn on standalone Figure objects with their own Agg canvas
+# rather than through pyplot, whose global figure manager is not thread-safe.
+def _new_figure():
+    from matplotlib.figure import Figure
+    from matplotlib.backends.backend_agg import FigureCanvasAgg
+
+    fig = Figure(figsize=(10, 6))
+    FigureCanvasAgg(fig)
+    return fig, fig.add_subplot()
+
+def _figure_png(fig):
+    fig.tight_layout()
+    img = io.BytesIO()
+    fig.savefig(img, format='png', dpi=100)
+    return img.getvalue()
+
+def _draw_win_loss_chart(cols):
+    import numpy as np
+
+    fig, ax = _new_figure()
+    x = np.arange(len(cols['name']))
+    width = 0.35
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS players (
-            id INTEGER PRIMARY KEY,
-            name TEXT NOT NULL,
-            team TEXT,
-            position TEXT,
-            ppg REAL,
-            rpg REAL,
-            apg REAL,
-            fg_pct REAL
-        )
-    ''')
+    ax.bar(x - width/2, cols['wins'], width, label='Wins', color='#1d428a')
+    ax.bar(x + width/2, cols['losses'], width, label='Losses', color='#c8102e')
     
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS games (
-            id INTEGER PRIMARY KEY,
-            date TEXT,
-            home_team TEXT,
-            away_team TEXT,
-            home_score INTEGER,
-            away_score INTEGER
-        )
-    ''')
+    ax.set_xlabel('Teams')
+    ax.set_ylabel('Games')
+    ax.set_title('NBA Team Wins vs Losses')
+    ax.set_xticks(x, cols['name'], rotation=45, ha='right')
+    ax.legend()
     
-    # Sample teams data
-    teams = [
-        (1, 'Los Angeles Lakers', 'West', 42, 30, 115.6, 112.3),
-        (2, 'Golden State Warriors', 'West', 38, 34, 118.3, 115.8),
-        (3, 'Boston Celtics', 'East', 57, 15, 121.1, 109.8),
-        (4, 'Chicago Bulls', 'East', 34, 38, 111.8, 113.5),
-        (5, 'Miami Heat', 'East', 40, 32, 113.4, 111.2),
-        (6, 'Denver Nuggets', 'West', 52, 20, 117.5, 112.9),
-        (7, 'Phoenix Suns', 'West', 44, 28, 116.8, 113.1),
-        (8, 'Milwaukee Bucks', 'East', 48, 24, 119.3, 114.6)
-    ]
+    return _figure_png(fig)
+
+def _draw_points_chart(cols):
+    fig, ax = _new_figure()
+    top, bottom = max(cols['ppg'], default=None), min(cols['ppg'], default=None)
+    colors = ['#1d428a' if x == top else '#c8102e' if x == bottom else '#2c5aa0' for x in cols['ppg']]
     
-    cursor.executemany('INSERT OR REPLACE INTO teams VALUES (?, ?, ?, ?, ?, ?, ?)', teams)
+    ax.bar(cols['name'], cols['ppg'], color=colors)
+    ax.set_xlabel('Teams')
+    ax.set_ylabel('Points Per Game')
+    ax.set_title('NBA Team Points Per Game')
+    ax.tick_params(axis='x', labelrotation=45)
+    for label in ax.get_xticklabels():
+        label.set_horizontalalignment('right')
     
-    # Sample players data
-    players = [
-        (1, 'LeBron James', 'Los Angeles Lakers', 'SF', 25.3, 7.3, 8.3, 53.5),
-        (2, 'Stephen Curry', 'Golden State Warriors', 'PG', 27.5, 4.3, 5.2, 45.3),
-        (3, 'Giannis Antetokounmpo', 'Milwaukee Bucks', 'PF', 30.8, 11.5, 6.4, 61.3),
-        (4, 'Kevin Durant', 'Phoenix Suns', 'SF', 27.6, 6.8, 5.2, 52.9),
-        (5, 'Luka Dončić', 'Dallas Mavericks', 'PG', 34.1, 9.0, 9.8, 49.2),
-        (6, 'Jayson Tatum', 'Boston Celtics', 'SF', 27.2, 8.3, 4.9, 47.1),
-        (7, 'Nikola Jokić', 'Denver Nuggets', 'C', 26.4, 12.4, 9.0, 58.3),
-        (8, 'Joel Embiid', 'Philadelphia 76ers', 'C', 35.3, 11.3, 5.7, 53.7)
+    return _figure_png(fig)
+
+# Charts served under /charts/<name>.png (and .svg / .json, see CHART_SERIES)
+# name -> draw function; the rows come from DashboardSnapshot.chart_data[name]
+CHARTS = {
+    'win-loss': _draw_win_loss_chart,
+    'ppg': _draw_points_chart,
+}
+
+
+# How the dashboard draws charts: 'png' (matplotlib on the server), 'svg'
+# (compact vector markup built on the server without matplotlib) or 'client'
+# (the page fetches each chart's series as JSON and draws it in the browser).
+# Set per deployment with NBA_CHART_MODE, or per request with /?charts=<mode>.
+CHART_MODES = ('png', 'svg', 'client')
+app.config['CHART_MODE'] = os.environ.get('NBA_CHART_MODE', 'png')
+
+def _win_loss_series(data):
+    return {
+        'title': 'NBA Team Wins vs Losses', 'xlabel': 'Teams', 'ylabel': 'Games',
+        'labels': [row[0] for row in data.rows],
+        'series': [
+            {'label': 'Wins', 'values': [row[1] for row in data.rows], 'color': '#1d428a'},
+            {'label': 'Losses', 'values': [row[2] for row in data.rows], 'color': '#c8102e'},
+        ],
+    }
+
+def _points_series(data):
+    values = [row[1] for row in data.rows]
+    top, bottom = (max(values), min(values)) if values else (None, None)
+    colors = ['#1d428a' if x == top else '#c8102e' if x == bottom else '#2c5aa0' for x in values]
+    return {
+        'title': 'NBA Team Points Per Game', 'xlabel': 'Teams', 'ylabel': 'Points Per Game',
+        'labels': [row[0] for row in data.rows],
+        'series': [{'label': 'PPG', 'values': values, 'colors': colors}],
+    }
+
+# name -> function turning ChartData into the plain series used by the svg and
+# client modes; mirrors what the matching CHARTS draw function plots
+CHART_SERIES = {
+    'win-loss': _win_loss_series,
+    'ppg': _points_series,
+}
+
+NICE_STEPS = (1, 1.2, 1.5, 2, 2.5, 3, 4, 5, 6, 8, 10)
+
+def _nice_ceiling(value):
+    """Smallest round number (1, 1.2, 1.5, 2, ... x 10^n) >= value, for the y-axis maximum"""
+    if value <= 0:
+        return 1
+    magnitude = 10 ** math.floor(math.log10(value))
+    for step in NICE_STEPS:
+        if step * magnitude >= value:
+            return step * magnitude
+
+def render_svg_chart(spec, width=1000, height=600):
+    """Draw a bar chart spec (see CHART_SERIES) as a compact SVG document"""
+    left, right, top, bottom = 70, 20, 50, 170
+    plot_w, plot_h = width - left - right, height - top - bottom
+    labels, series = spec['labels'], spec['series']
+    ymax = _nice_ceiling(max((v for s in series for v in s['values']), default=0))
+    group_w = plot_w / max(len(labels), 1)
+    bar_w = group_w * 0.8 / max(len(series), 1)
+    esc = html.escape
+
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 {width} {height}" '
+        f'font-family="sans-serif" font-size="12">',
+        f'<text x="{width / 2:g}" y="28" text-anchor="middle" font-size="16">{esc(spec["title"])}</text>',
+        f'<text transform="translate(18 {top + plot_h / 2:g}) rotate(-90)" text-anchor="middle">'
+        f'{esc(spec["ylabel"])}</text>',
+        f'<text x="{left + plot_w / 2:g}" y="{height - 8}" text-anchor="middle">{esc(spec["xlabel"])}</text>',
     ]
-    
-    cursor.executemany('INSERT OR REPLACE INTO players VALUES (?, ?, ?, ?, ?, ?, ?, ?)', players)
-    
-    conn.commit()
-    conn.close()
+    for i in range(6):
+        value = ymax * i / 5
+        y = top + plot_h - plot_h * i / 5
+        parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{y:.1f}" y2="{y:.1f}" stroke="#ddd"/>'
+                     f'<text x="{left - 6}" y="{y + 4:.1f}" text-anchor="end">{value:g}</text>')
+    for s_index, s in enumerate(series):
+        colors = s.get('colors') or [s['color']] * len(s['values'])
+        for i, (value, color) in enumerate(zip(s['values'], colors)):
+            bar_h = plot_h * value / ymax
+            x = left + i * group_w + group_w * 0.1 + s_index * bar_w
+            parts.append(f'<rect x="{x:.1f}" y="{top + plot_h - bar_h:.1f}" width="{bar_w:.1f}" '
+                         f'height="{bar_h:.1f}" fill="{color}"><title>{esc(labels[i])}: {value:g}</title></rect>')
+    for i, label in enumerate(labels):
+        x = left + (i + 0.5) * group_w
+        y = top + plot_h + 14
+        parts.append(f'<text transform="translate({x:.1f} {y}) rotate(-45)" text-anchor="end">{esc(label)}</text>')
+    parts.append(f'<line x1="{left}" x2="{left + plot_w}" y1="{top + plot_h}" y2="{top + plot_h}" stroke="#000"/>')
+    if len(series) > 1:
+        for i, s in enumerate(series):
+            y = top + 10 + i * 18
+            parts.append(f'<rect x="{left + plot_w - 90}" y="{y}" width="12" height="12" fill="{s["color"]}"/>'
+                         f'<text x="{left + plot_w - 72}" y="{y + 10}">{esc(s["label"])}</text>')
+    parts.append('</svg>')
+    return ''.join(parts)
+
+def chart_mode():
+    """The chart mode for this request: ?charts= if valid, else the deployment default"""
+    mode = request.args.get('charts', app.config['CHART_MODE'])
+    return mode if mode in CHART_MODES else app.config['CHART_MODE']
+
+CHART_RENDER_WORKERS = 2
+_chart_executor = ThreadPoolExecutor(max_workers=CHART_RENDER_WORKERS, thread_name_prefix='chart')
+
+def get_chart(name):
+    return render_chart(name, get_dashboard_snapshot().chart_data[name], CHARTS[name])
+
+def render_all_charts():
+    """Render (or fetch from cache) every chart concurrently; returns {name: ChartImage}"""
+    futures = {name: _chart_executor.submit(get_chart, name) for name in CHARTS}
+    return {name: future.result() for name, future in futures.items()}
+
+# Stale-while-revalidate: the newest finished render of each chart (per
+# season) is served while a render for changed data runs on _chart_executor. Renders are
+# numbered when scheduled so a slow, older one can never replace a newer one.
+CHART_PRERENDER_INTERVAL = 1.0
+_latest_charts = {}
+_pending_renders = {}
+_render_lock = threading.Lock()
+_render_sequence = itertools.count(1)
+_prerender_thread = None
+_prerender_stop = threading.Event()
+
+def schedule_chart_render(name, data, season=None, counted=False):
+    """Render chart `name` from `season`'s `data` on the worker pool; returns its Future
+
+    Requests for a render that is already queued or running share its Future.
+    `counted` is passed on to render_chart.
+    """
+    key = (season, name, data.etag)
+    with _render_lock:
+        future = _pending_renders.get(key)
+        if future is not None:
+            return future
+        sequence = next(_render_sequence)
+        future = _chart_executor.submit(render_chart, name, data, CHARTS[name], counted)
+        _pending_renders[key] = future
+
+    def publish(done):
+        with _render_lock:
+            _pending_renders.pop(key, None)
+            if done.exception() is None:
+                latest = _latest_charts.get((season, name))
+                if latest is None or latest[0] < sequence:
+                    _latest_charts[(season, name)] = (sequence, done.result())
+    future.add_done_callback(publish)
+    return future
+
+def serve_chart(name, season=None):
+    """The ChartImage to send for `name` without waiting on matplotlib when avoidable
+
+    Returns the current render if cached, otherwise the previous one while a
+    fresh render runs in the background. Only a chart that has never been
+    rendered for `season` in this process is rendered inline.
+    """
+    data = get_dashboard_snapshot(season).chart_data[name]
+    chart = cached_chart(name, data.etag)
+    if chart is not None:
+        return chart
+    future = schedule_chart_render(name, data, season, counted=True)
+    with _render_lock:
+        stale = _latest_charts.get((season, name))
+    if stale is not None:
+        return stale[1]
+    return future.result()
+
+def _prerender_loop(interval):
+    last_version = None
+    while not _prerender_stop.is_set():
+        try:
+            snapshot = get_dashboard_snapshot()
+            if snapshot.versions['teams'] != last_version:
+                for name in CHARTS:
+                    schedule_chart_render(name, snapshot.chart_data[name])
+                last_version = snapshot.versions['teams']
+            precompress_queued()
+        except Exception:
+            app.logger.exception('chart pre-render failed')
+        _prerender_stop.wait(interval)
+
+def start_chart_prerenderer(interval=CHART_PRERENDER_INTERVAL):
+    """Start the daemon thread that re-renders charts as soon as teams data changes
+
+    It also precompresses the pages queued by queue_precompress().
+    """
+    global _prerender_thread
+    with _render_lock:
+        if _prerender_thread is not None and _prerender_thread.is_alive():
+            return _prerender_thread
+        _prerender_stop.clear()
+        _prerender_thread = threading.Thread(
+            target=_prerender_loop, args=(interval,), name='chart-prerender', daemon=True)
+        _prerender_thread.start()
+        return _prerender_thread
+
+def stop_chart_prerenderer():
+    _prerender_stop.set()
+    if _prerender_thread is not None:
+        _prerender_thread.join()
 
 def create_win_loss_chart():
     """Create a matplotlib chart for team wins/losses"""
-    conn = sqlite3.connect('nba_sample.db')
-    df = pd.read_sql_query("SELECT name, wins, losses FROM teams ORDER BY wins DESC", conn)
-    conn.close()
-    
-    plt.figure(figsize=(10, 6))
-    x = np.arange(len(df))
-    width = 0.35
-    
-    plt.bar(x - width/2, df['wins'], width, label='Wins', color='#1d428a')
-    plt.bar(x + width/2, df['losses'], width, label='Losses', color='#c8102e')
-    
-    plt.xlabel('Teams')
-    plt.ylabel('Games')
-    plt.title('NBA Team Wins vs Losses')
-    plt.xticks(x, df['name'], rotation=45, ha='right')
-    plt.legend()
-    plt.tight_layout()
-    
-    # Save to bytes
-    img = io.BytesIO()
-    plt.savefig(img, format='png', dpi=100)
-    img.seek(0)
-    plt.close()
-    
-    return base64.b64encode(img.getvalue()).decode()
+    return base64.b64encode(get_chart('win-loss').png).decode()
 
 def create_points_chart():
     """Create a points per game chart"""
-    conn = sqlite3.connect('nba_sample.db')
-    df = pd.read_sql_query("SELECT name, ppg FROM teams ORDER BY ppg DESC", conn)
-    conn.close()
-    
-    plt.figure(figsize=(10, 6))
-    colors = ['#1d428a' if x == df['ppg'].max() else '#c8102e' if x == df['ppg'].min() else '#2c5aa0' for x in df['ppg']]
+    return base64.b64encode(get_chart('ppg').png).decode()
+
+# Advanced metrics, computed with whole-column pandas/NumPy operations and
+# cached per (database, metric, parameters) until the source table's data
+# version moves.
+PYTHAGOREAN_EXPONENT = 13.91
+METRICS_ROLLING_WINDOW = 10
+METRICS_CACHE_MAX_ENTRIES = 64
+_metrics_cache = {}
+_metrics_cache_lock = threading.Lock()
+metrics_cache_stats = {'hits': 0, 'misses': 0}
+
+def cached_metric(name, table, compute, *params, conn=None):
+    """Return compute(conn, *params), reusing the last result while `table` is unchanged
+
+    `conn` picks the season's database; it defaults to the current season.
+    """
+    conn = conn or get_db()
+    version = get_data_versions(conn)[table]
+    key = (database_path(conn), name) + params
+    with _metrics_cache_lock:
+        entry = _metrics_cache.get(key)
+        if entry is not None and entry[0] == version:
+            metrics_cache_stats['hits'] += 1
+            return entry[1]
+        metrics_cache_stats['misses'] += 1
+    with span(f'metrics.{name}'):
+        result = compute(conn, *params)
+    with _metrics_cache_lock:
+        if len(_metrics_cache) >= METRICS_CACHE_MAX_ENTRIES:
+            _metrics_cache.clear()
+        _metrics_cache[key] = (version, result)
+    return result
+
+def _frame_records(df):
+    """DataFrame -> list of JSON-ready dicts (rounded, NaN as None)"""
+    df = df.round(3)
+    return df.astype(object).where(df.notna(), None).to_dict('records')
+
+# Columnar snapshots. Each table is published as one .npy file per column
+# under <SNAPSHOT_DIR>/<table>/v<data version>/, written once per version and
+# memory-mapped by readers, so analytics read shared page-cache pages instead
+# of re-parsing SQLite rows in every call and every worker. TEXT columns are
+# int32 codes (-1 for NULL) into strings.npy, the table's sorted distinct
+# strings, so code order is string order. Snapshots sit next to their
+# database (nba_sample.db -> nba_sample-snapshots/, and likewise for each
+# season's file), or in NBA_SNAPSHOT_DIR/<database name>/ when that is set.
+app.config['SNAPSHOT_DIR'] = os.environ.get('NBA_SNAPSHOT_DIR')
+SNAPSHOT_KEEP_VERSIONS = 2
+SNAPSHOT_OPEN_ATTEMPTS = 3
+
+ColumnarTable = namedtuple('ColumnarTable', [
+    'table', 'version', 'rows', 'columns', 'strings', 'text_columns', 'path'])
+_columnar = {}
+_columnar_lock = threading.Lock()
+
+def snapshot_dir(conn):
+    stem = os.path.splitext(database_path(conn))[0]
+    if app.config['SNAPSHOT_DIR']:
+        return os.path.join(app.config['SNAPSHOT_DIR'], os.path.basename(stem))
+    return stem + '-snapshots'
+
+def write_columnar_snapshot(conn, table):
+    """Write `table` at its current data version unless that version exists; returns its directory"""
+    import numpy as np
+
+    columns = API_TABLES[table].columns
+    types = {row[1]: row[2].upper() for row in conn.execute(f'PRAGMA table_info({table})')}
+    text_columns = [column for column in columns if types[column] == 'TEXT']
+    # One read transaction, so the version and every column agree
+    conn.execute('BEGIN')
+    try:
+        version = get_data_versions(conn)[table]
+        target = os.path.join(snapshot_dir(conn), table, f'v{version}')
+        if os.path.exists(target):
+            return target
+        rows = conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+        strings = [row[0] for row in conn.execute(
+            ' UNION '.join(f'SELECT {column} FROM {table} WHERE {column} IS NOT NULL'
+                           for column in text_columns) + ' ORDER BY 1')] if text_columns else []
+        codes = {string: code for code, string in enumerate(strings)}
+        arrays = {}
+        for column in columns:
+            cursor = conn.execute(f'SELECT {column} FROM {table} ORDER BY id')
+            if column in text_columns:
+                arrays[column] = np.fromiter((codes.get(value, -1) for (value,) in cursor), np.int32, rows)
+            elif types[column] == 'INTEGER' and not conn.execute(
+                    f'SELECT EXISTS (SELECT 1 FROM {table} WHERE {column} IS NULL)').fetchone()[0]:
+                arrays[column] = np.fromiter((value for (value,) in cursor), np.int64, rows)
+            else:
+                arrays[column] = np.fromiter(
+                    (math.nan if value is None else value for (value,) in cursor), np.float64, rows)
+    finally:
+        conn.rollback()
+
+    os.makedirs(os.path.dirname(target), exist_ok=True)
+    staging = tempfile.mkdtemp(prefix='.staging-', dir=os.path.dirname(target))
+    np.save(os.path.join(staging, 'strings.npy'), np.array(strings, dtype=str))
+    for column, array in arrays.items():
+        np.save(os.path.join(staging, f'{column}.npy'), array)
+    with open(os.path.join(staging, 'manifest.json'), 'w') as f:
+        json.dump({'table': table, 'version': version, 'rows': rows, 'text_columns': text_columns,
+                   'columns': {column: str(array.dtype) for column, array in arrays.items()}}, f)
+    try:
+        os.rename(staging, target)
+    except OSError:
+        # Another worker published this version first
+        shutil.rmtree(staging, ignore_errors=True)
+
+    # Open memory maps of pruned versions stay valid until they are closed
+    versions = sorted(int(name[1:]) for name in os.listdir(os.path.dirname(target))
+                      if name.startswith('v') and name[1:].isdigit())
+    for old in versions[:-SNAPSHOT_KEEP_VERSIONS]:
+        shutil.rmtree(os.path.join(os.path.dirname(target), f'v{old}'), ignore_errors=True)
+    return target
+
+def _open_columnar(path):
+    import numpy as np
+
+    with open(os.path.join(path, 'manifest.json')) as f:
+        manifest = json.load(f)
+    columns = {column: np.load(os.path.join(path, f'{column}.npy'), mmap_mode='r')
+               for column in manifest['columns']}
+    return ColumnarTable(manifest['table'], manifest['version'], manifest['rows'], columns,
+                         np.load(os.path.join(path, 'strings.npy'), mmap_mode='r'),
+                         tuple(manifest['text_columns']), path)
+
+def columnar_table(table, conn=None):
+    """The memory-mapped ColumnarTable of `table` at its current data version, written first if missing"""
+    conn = conn or get_db()
+    directory = os.path.join(snapshot_dir(conn), table)
+    for attempt in range(1, SNAPSHOT_OPEN_ATTEMPTS + 1):
+        version = get_data_versions(conn)[table]
+        snapshot = _columnar.get(directory)
+        path = os.path.join(directory, f'v{version}')
+        if snapshot is not None and snapshot.path == path:
+            return snapshot
+        try:
+            if not os.path.exists(path):
+                with _columnar_lock, span(f'snapshot.write.{table}'):
+                    path = write_columnar_snapshot(conn, table)
+            snapshot = _columnar[directory] = _open_columnar(path)
+            return snapshot
+        except FileNotFoundError:
+            # Another worker pruned this version after publishing a newer one
+            if attempt == SNAPSHOT_OPEN_ATTEMPTS:
+                raise
+
+def columnar_frame(table, conn=None):
+    """`table`'s columnar snapshot as a DataFrame, with TEXT columns as Categoricals"""
+    import pandas as pd
+
+    snapshot = columnar_table(table, conn)
+    categories = pd.Index(snapshot.strings, dtype=object)
+    return pd.DataFrame({
+        column: pd.Categorical.from_codes(values, categories=categories)
+        if column in snapshot.text_columns else values
+        for column, values in snapshot.columns.items()
+    })
+
+@app.cli.command('write-snapshots')
+def write_snapshots_command():
+    """Write columnar snapshots of every table at its current data version."""
+    conn = connect_db()
+    try:
+        for table in API_TABLES:
+            click.echo(write_columnar_snapshot(conn, table))
+    finally:
+        conn.close()
+
+def team_game_frame(conn):
+    """One row per team per game (team, opponent, home, scored, allowed, won), in date order"""
+    import pandas as pd
+
+    games = columnar_frame('games', conn)
+    sides = [
+        pd.DataFrame({'game_id': games['id'], 'date': games['date'],
+                      'team': games[team], 'opponent': games[opponent],
+                      'home': is_home, 'scored': games[scored], 'allowed': games[allowed]})
+        for team, opponent, is_home, scored, allowed in (
+            ('home_team', 'away_team', True, 'home_score', 'away_score'),
+            ('away_team', 'home_team', False, 'away_score', 'home_score'))
+    ]
+    frame = pd.concat(sides, ignore_index=True)
+    frame['team'] = frame['team'].cat.remove_unused_categories()
+    frame['won'] = frame['scored'] > frame['allowed']
+    return frame.sort_values(['team', 'date', 'game_id'], kind='stable', ignore_index=True)
+
+def compute_team_ratings(conn):
+    """Per-team ratings and Pythagorean expectation from the teams table
+
+    The schema has no possession counts, so offensive/defensive ratings are
+    points scored/allowed per game rather than per 100 possessions.
+    """
+    import numpy as np
+    import pandas as pd
+
+    teams = columnar_frame('teams', conn)
+    ppg = teams['ppg'].to_numpy(dtype=float)
+    opp = teams['opp_ppg'].to_numpy(dtype=float)
+    played = (teams['wins'] + teams['losses']).to_numpy(dtype=float)
+    scored_exp = np.power(ppg, PYTHAGOREAN_EXPONENT)
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pythag = scored_exp / (scored_exp + np.power(opp, PYTHAGOREAN_EXPONENT))
+        win_pct = teams['wins'].to_numpy(dtype=float) / played
+    result = pd.DataFrame({
+        'id': teams['id'], 'name': teams['name'], 'conference': teams['conference'],
+        'off_rating': ppg, 'def_rating': opp, 'net_rating': ppg - opp,
+        'win_pct': win_pct, 'pythag_win_pct': pythag,
+        'pythag_wins': pythag * played, 'luck': teams['wins'] - pythag * played,
+    })
+    return _frame_records(result.sort_values('net_rating', ascending=False))
+
+def compute_game_splits(conn, window):
+    """Per-team home/away splits and last-`window`-game averages from games"""
+    frame = cached_metric('team_game_frame', 'games', team_game_frame, conn=conn)
+    if frame.empty:
+        return []
+    splits = frame.groupby(['team', 'home'], observed=True).agg(
+        games=('won', 'size'), wins=('won', 'sum'),
+        ppg=('scored', 'mean'), opp_ppg=('allowed', 'mean'),
+    ).unstack('home', fill_value=0)
+    splits.columns = [f'{"home" if home else "away"}_{stat}' for stat, home in splits.columns]
+
+    recent = frame.groupby('team', observed=True).tail(window).groupby('team', observed=True).agg(
+        ppg=('scored', 'mean'), opp_ppg=('allowed', 'mean'), wins=('won', 'sum'), games=('won', 'size'))
+    recent.columns = [f'last_{window}_{stat}' for stat in recent.columns]
+
+    result = splits.join(recent).reset_index()
+    result['team'] = result['team'].astype(str)
+    for column in result.columns:
+        if column.endswith(('_games', '_wins')):
+            result[column] = result[column].astype(int)
+    return _frame_records(result)
+
+def compute_rolling_averages(conn, team, window):
+    """Rolling `window`-game scoring averages for one team, one entry per game"""
+    import pandas as pd
+
+    frame = cached_metric('team_game_frame', 'games', team_game_frame, conn=conn)
+    frame = frame[frame['team'] == team]
+    rolling = frame[['scored', 'allowed']].rolling(window, min_periods=1).mean()
+    result = pd.DataFrame({
+        'date': frame['date'], 'opponent': frame['opponent'], 'home': frame['home'],
+        'scored': frame['scored'], 'allowed': frame['allowed'],
+        'rolling_ppg': rolling['scored'], 'rolling_opp_ppg': rolling['allowed'],
+    })
+    return _frame_records(result)
+
+# Stylesheet and scripts for the dashboard, served from /assets/ as separate,
+# long-cacheable files (see asset_url) instead of inline in every page.
+DASHBOARD_CSS = '''
+:root {
+    --primary: #1d428a;
+    --secondary: #c8102e;
+    --dark: #0c1b33;
+    --light: #f8f9fa;
+    --gray: #6c757d;
+}
+
+* {
+    margin: 0;
+    padding: 0;
+    box-sizing: border-box;
+    font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
+}
+
+body {
+    background-color: #f5f7fa;
+    color: #333;
+    line-height: 1.6;
+}
+
+.container {
+    width: 90%;
+    max-width: 1200px;
+    margin: 0 auto;
+    padding: 0 15px;
+}
+
+/* Header */
+header {
+    background: linear-gradient(135deg, var(--primary), var(--dark));
+    color: white;
+    padding: 1rem 0;
+    box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
+}
+
+.header-content {
+    display: flex;
+    justify-content: space-between;
+    align-items: center;
+}
+
+.logo {
+    display: flex;
+    align-items: center;
+    gap: 10px;
+}
+
+.logo i {
+    font-size: 2rem;
+    color: var(--secondary);
+}
+
+.logo h1 {
+    font-size: 1.8rem;
+    font-weight: 700;
+}
+
+nav ul {
+    display: flex;
+    list-style: none;
+}
+
+nav ul li {
+    margin-left: 1.5rem;
+}
+
+nav ul li a {
+    color: white;
+    text-decoration: none;
+    font-weight: 500;
+    transition: color 0.3s;
+    padding: 0.5rem 0;
+}
+
+nav ul li a:hover {
+    color: var(--secondary);
+}
+
+/* Hero Section */
+.hero {
+    background: linear-gradient(rgba(13, 29, 56, 0.8), rgba(13, 29, 56, 0.9));
+    background-size: cover;
+    color: white;
+    padding: 3rem 0;
+    text-align: center;
+}
+
+.hero h2 {
+    font-size: 2.5rem;
+    margin-bottom: 1rem;
+}
+
+.hero p {
+    font-size: 1.2rem;
+    max-width: 700px;
+    margin: 0 auto 2rem;
+}
+
+.btn {
+    display: inline-block;
+    background-color: var(--secondary);
+    color: white;
+    padding: 0.8rem 1.5rem;
+    border: none;
+    border-radius: 4px;
+    font-weight: 600;
+    cursor: pointer;
+    transition: all 0.3s;
+    text-decoration: none;
+}
+
+.btn:hover {
+    background-color: #a00d24;
+    transform: translateY(-2px);
+}
+
+/* Main Content */
+.main-content {
+    padding: 3rem 0;
+}
+
+.section-title {
+    text-align: center;
+    margin-bottom: 2rem;
+    color: var(--primary);
+    position: relative;
+}
+
+.section-title::after {
+    content: '';
+    position: absolute;
+    bottom: -10px;
+    left: 50%;
+    transform: translateX(-50%);
+    width: 80px;
+    height: 4px;
+    background-color: var(--secondary);
+}
+
+/* Dashboard */
+.season-nav {
+    display: flex;
+    flex-wrap: wrap;
+    justify-content: center;
+    gap: 0.5rem;
+    margin-bottom: 2rem;
+}
+
+.season-nav a {
+    padding: 0.3rem 0.8rem;
+    border: 1px solid var(--primary);
+    border-radius: 4px;
+    color: var(--primary);
+    text-decoration: none;
+}
+
+.season-nav a.active {
+    background-color: var(--primary);
+    color: white;
+}
+
+.dashboard-stats {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
+    gap: 1.5rem;
+    margin-bottom: 3rem;
+}
+
+.stat-card {
+    background-color: white;
+    padding: 1.5rem;
+    border-radius: 8px;
+    box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
+    text-align: center;
+    transition: transform 0.3s;
+}
+
+.stat-card:hover {
+    transform: translateY(-5px);
+}
+
+.stat-card i {
+    font-size: 2rem;
+    color: var(--primary);
+    margin-bottom: 1rem;
+}
+
+.stat-card h3 {
+    font-size: 1.8rem;
+    margin-bottom: 0.5rem;
+    color: var(--dark);
+}
+
+.stat-card p {
+    color: var(--gray);
+    font-weight: 500;
+}
+
+/* Charts */
+.charts-grid {
+    display: grid;
+    grid-template-columns: 1fr 1fr;
+    gap: 2rem;
+    margin-bottom: 3rem;
+}
+
+.chart-container {
+    background-color: white;
+    padding: 1.5rem;
+    border-radius: 8px;
+    box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
+}
+
+.chart-container img {
+    width: 100%;
+    height: auto;
+}
+
+/* Tables */
+.data-table {
+    background-color: white;
+    border-radius: 8px;
+    overflow: hidden;
+    box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
+    margin-bottom: 3rem;
+}
+
+table {
+    width: 100%;
+    border-collapse: collapse;
+}
+
+thead {
+    background-color: var(--primary);
+    color: white;
+}
+
+th, td {
+    padding: 1rem;
+    text-align: left;
+}
+
+tbody tr {
+    border-bottom: 1px solid #eee;
+}
+
+tbody tr:hover {
+    background-color: #f8f9fa;
+}
+
+/* Footer */
+footer {
+    background-color: var(--dark);
+    color: white;
+    padding: 2rem 0;
+    text-align: center;
+}
+
+.footer-content {
+    display: grid;
+    grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
+    gap: 2rem;
+    margin-bottom: 2rem;
+}
+
+.copyright {
+    padding-top: 1.5rem;
+    border-top: 1px solid rgba(255, 255, 255, 0.1);
+    color: #aaa;
+}
+
+@media (max-width: 768px) {
+    .charts-grid {
+        grid-template-columns: 1fr;
+    }
     
-    plt.bar(df['name'], df['ppg'], color=colors)
-    plt.xlabel('Teams')
-    plt.ylabel('Points Per Game')
-    plt.title('NBA Team Points Per Game')
-    plt.xticks(rotation=45, ha='right')
-    plt.tight_layout()
+    .header-content {
+        flex-direction: column;
+        text-align: center;
+        gap: 1rem;
+    }
     
-    img = io.BytesIO()
-    plt.savefig(img, format='png', dpi=100)
-    img.seek(0)
-    plt.close()
+    nav ul {
+        flex-direction: column;
+        gap: 0.5rem;
+    }
     
-    return base64.b64encode(img.getvalue()).decode()
+    nav ul li {
+        margin-left: 0;
+    }
+}
+'''
+
+DASHBOARD_JS = '''
+// Smooth scrolling for navigation links
+document.querySelectorAll('a[href^="#"]').forEach(anchor => {
+    anchor.addEventListener('click', function (e) {
+        e.preventDefault();
+        document.querySelector(this.getAttribute('href')).scrollIntoView({
+            behavior: 'smooth'
+        });
+    });
+});
+'''
+
+# Client chart mode: draws each chart's JSON series as SVG (same layout as render_svg_chart)
+CHARTS_JS = '''
+function niceCeiling(v) {
+    if (v <= 0) return 1;
+    const m = Math.pow(10, Math.floor(Math.log10(v)));
+    return [1, 1.2, 1.5, 2, 2.5, 3, 4, 5, 6, 8, 10].map(s => s * m).find(c => c >= v);
+}
+function esc(s) {
+    return String(s).replace(/[&<>"]/g, c => ({'&': '&amp;', '<': '&lt;', '>': '&gt;', '"': '&quot;'}[c]));
+}
+function drawChart(spec) {
+    const W = 1000, H = 600, L = 70, R = 20, T = 50, B = 170, pw = W - L - R, ph = H - T - B;
+    const series = spec.series, labels = spec.labels;
+    const ymax = niceCeiling(Math.max(0, ...series.flatMap(s => s.values)));
+    const gw = pw / Math.max(labels.length, 1), bw = gw * 0.8 / Math.max(series.length, 1);
+    const p = [`<svg xmlns="http://www.w3.org/2000/svg" viewBox="0 0 ${W} ${H}" font-family="sans-serif" font-size="12">`,
+        `<text x="${W / 2}" y="28" text-anchor="middle" font-size="16">${esc(spec.title)}</text>`,
+        `<text transform="translate(18 ${T + ph / 2}) rotate(-90)" text-anchor="middle">${esc(spec.ylabel)}</text>`,
+        `<text x="${L + pw / 2}" y="${H - 8}" text-anchor="middle">${esc(spec.xlabel)}</text>`];
+    for (let i = 0; i < 6; i++) {
+        const y = T + ph - ph * i / 5;
+        p.push(`<line x1="${L}" x2="${L + pw}" y1="${y}" y2="${y}" stroke="#ddd"/><text x="${L - 6}" y="${y + 4}" text-anchor="end">${+(ymax * i / 5).toFixed(2)}</text>`);
+    }
+    series.forEach((s, si) => s.values.forEach((v, i) => {
+        const h = ph * v / ymax, x = L + i * gw + gw * 0.1 + si * bw;
+        p.push(`<rect x="${x}" y="${T + ph - h}" width="${bw}" height="${h}" fill="${s.colors ? s.colors[i] : s.color}"><title>${esc(labels[i])}: ${v}</title></rect>`);
+    }));
+    labels.forEach((label, i) => p.push(`<text transform="translate(${L + (i + 0.5) * gw} ${T + ph + 14}) rotate(-45)" text-anchor="end">${esc(label)}</text>`));
+    p.push(`<line x1="${L}" x2="${L + pw}" y1="${T + ph}" y2="${T + ph}" stroke="#000"/>`);
+    if (series.length > 1) series.forEach((s, i) => {
+        const y = T + 10 + i * 18;
+        p.push(`<rect x="${L + pw - 90}" y="${y}" width="12" height="12" fill="${s.color}"/><text x="${L + pw - 72}" y="${y + 10}">${esc(s.label)}</text>`);
+    });
+    return p.join('') + '</svg>';
+}
+document.querySelectorAll('.client-chart').forEach(el => {
+    fetch(el.dataset.series).then(r => r.json()).then(spec => { el.innerHTML = drawChart(spec); });
+});
+'''
 
 # HTML Template
 HTML_TEMPLATE = '''
@@ -145,279 +1910,7 @@ HTML_TEMPLATE = '''
     <meta charset="UTF-8">
     <meta name="viewport" content="width=device-width, initial-scale=1.0">
     <title>NBA Data Hub</title>
-    <style>
-        :root {
-            --primary: #1d428a;
-            --secondary: #c8102e;
-            --dark: #0c1b33;
-            --light: #f8f9fa;
-            --gray: #6c757d;
-        }
-        
-        * {
-            margin: 0;
-            padding: 0;
-            box-sizing: border-box;
-            font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif;
-        }
-        
-        body {
-            background-color: #f5f7fa;
-            color: #333;
-            line-height: 1.6;
-        }
-        
-        .container {
-            width: 90%;
-            max-width: 1200px;
-            margin: 0 auto;
-            padding: 0 15px;
-        }
-        
-        /* Header */
-        header {
-            background: linear-gradient(135deg, var(--primary), var(--dark));
-            color: white;
-            padding: 1rem 0;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
-        }
-        
-        .header-content {
-            display: flex;
-            justify-content: space-between;
-            align-items: center;
-        }
-        
-        .logo {
-            display: flex;
-            align-items: center;
-            gap: 10px;
-        }
-        
-        .logo i {
-            font-size: 2rem;
-            color: var(--secondary);
-        }
-        
-        .logo h1 {
-            font-size: 1.8rem;
-            font-weight: 700;
-        }
-        
-        nav ul {
-            display: flex;
-            list-style: none;
-        }
-        
-        nav ul li {
-            margin-left: 1.5rem;
-        }
-        
-        nav ul li a {
-            color: white;
-            text-decoration: none;
-            font-weight: 500;
-            transition: color 0.3s;
-            padding: 0.5rem 0;
-        }
-        
-        nav ul li a:hover {
-            color: var(--secondary);
-        }
-        
-        /* Hero Section */
-        .hero {
-            background: linear-gradient(rgba(13, 29, 56, 0.8), rgba(13, 29, 56, 0.9));
-            background-size: cover;
-            color: white;
-            padding: 3rem 0;
-            text-align: center;
-        }
-        
-        .hero h2 {
-            font-size: 2.5rem;
-            margin-bottom: 1rem;
-        }
-        
-        .hero p {
-            font-size: 1.2rem;
-            max-width: 700px;
-            margin: 0 auto 2rem;
-        }
-        
-        .btn {
-            display: inline-block;
-            background-color: var(--secondary);
-            color: white;
-            padding: 0.8rem 1.5rem;
-            border: none;
-            border-radius: 4px;
-            font-weight: 600;
-            cursor: pointer;
-            transition: all 0.3s;
-            text-decoration: none;
-        }
-        
-        .btn:hover {
-            background-color: #a00d24;
-            transform: translateY(-2px);
-        }
-        
-        /* Main Content */
-        .main-content {
-            padding: 3rem 0;
-        }
-        
-        .section-title {
-            text-align: center;
-            margin-bottom: 2rem;
-            color: var(--primary);
-            position: relative;
-        }
-        
-        .section-title::after {
-            content: '';
-            position: absolute;
-            bottom: -10px;
-            left: 50%;
-            transform: translateX(-50%);
-            width: 80px;
-            height: 4px;
-            background-color: var(--secondary);
-        }
-        
-        /* Dashboard */
-        .dashboard-stats {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(250px, 1fr));
-            gap: 1.5rem;
-            margin-bottom: 3rem;
-        }
-        
-        .stat-card {
-            background-color: white;
-            padding: 1.5rem;
-            border-radius: 8px;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
-            text-align: center;
-            transition: transform 0.3s;
-        }
-        
-        .stat-card:hover {
-            transform: translateY(-5px);
-        }
-        
-        .stat-card i {
-            font-size: 2rem;
-            color: var(--primary);
-            margin-bottom: 1rem;
-        }
-        
-        .stat-card h3 {
-            font-size: 1.8rem;
-            margin-bottom: 0.5rem;
-            color: var(--dark);
-        }
-        
-        .stat-card p {
-            color: var(--gray);
-            font-weight: 500;
-        }
-        
-        /* Charts */
-        .charts-grid {
-            display: grid;
-            grid-template-columns: 1fr 1fr;
-            gap: 2rem;
-            margin-bottom: 3rem;
-        }
-        
-        .chart-container {
-            background-color: white;
-            padding: 1.5rem;
-            border-radius: 8px;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
-        }
-        
-        .chart-container img {
-            width: 100%;
-            height: auto;
-        }
-        
-        /* Tables */
-        .data-table {
-            background-color: white;
-            border-radius: 8px;
-            overflow: hidden;
-            box-shadow: 0 2px 10px rgba(0, 0, 0, 0.05);
-            margin-bottom: 3rem;
-        }
-        
-        table {
-            width: 100%;
-            border-collapse: collapse;
-        }
-        
-        thead {
-            background-color: var(--primary);
-            color: white;
-        }
-        
-        th, td {
-            padding: 1rem;
-            text-align: left;
-        }
-        
-        tbody tr {
-            border-bottom: 1px solid #eee;
-        }
-        
-        tbody tr:hover {
-            background-color: #f8f9fa;
-        }
-        
-        /* Footer */
-        footer {
-            background-color: var(--dark);
-            color: white;
-            padding: 2rem 0;
-            text-align: center;
-        }
-        
-        .footer-content {
-            display: grid;
-            grid-template-columns: repeat(auto-fit, minmax(200px, 1fr));
-            gap: 2rem;
-            margin-bottom: 2rem;
-        }
-        
-        .copyright {
-            padding-top: 1.5rem;
-            border-top: 1px solid rgba(255, 255, 255, 0.1);
-            color: #aaa;
-        }
-        
-        @media (max-width: 768px) {
-            .charts-grid {
-                grid-template-columns: 1fr;
-            }
-            
-            .header-content {
-                flex-direction: column;
-                text-align: center;
-                gap: 1rem;
-            }
-            
-            nav ul {
-                flex-direction: column;
-                gap: 0.5rem;
-            }
-            
-            nav ul li {
-                margin-left: 0;
-            }
-        }
-    </style>
+    <link rel="stylesheet" href="{{ asset_url('dashboard.css') }}">
 </head>
 <body>
     <!-- Header -->
@@ -454,7 +1947,13 @@ HTML_TEMPLATE = '''
         <div class="container">
             <!-- Dashboard Section -->
             <section id="dashboard">
-                <h2 class="section-title">NBA Dashboard</h2>
+                <h2 class="section-title">NBA Dashboard {{ season or seasons[0] }}</h2>
+
+                <nav class="season-nav" aria-label="Seasons">
+                    {% for name in seasons %}
+                    <a href="{{ url_for('index', season=None if loop.first else name) }}"{% if name == (season or seasons[0]) %} class="active" aria-current="page"{% endif %}>{{ name }}</a>
+                    {% endfor %}
+                </nav>
                 
                 <div class="dashboard-stats">
                     <div class="stat-card">
@@ -484,14 +1983,21 @@ HTML_TEMPLATE = '''
             <section id="visualizations">
                 <h2 class="section-title">Data Visualizations</h2>
                 
+                {% macro chart(name, alt) -%}
+                    {% if chart_mode == 'client' -%}
+                        <div class="client-chart" data-series="{{ url_for('chart_series', name=name, season=season, v=chart_versions[name]) }}" role="img" aria-label="{{ alt }}"></div>
+                    {%- else -%}
+                        <img src="{{ url_for('chart_svg' if chart_mode == 'svg' else 'chart_image', name=name, season=season, v=chart_versions[name]) }}" width="1000" height="600" alt="{{ alt }}">
+                    {%- endif %}
+                {%- endmacro %}
                 <div class="charts-grid">
                     <div class="chart-container">
                         <h3>Team Wins vs Losses</h3>
-                        <img src="data:image/png;base64,{{ win_loss_chart }}" alt="Wins vs Losses Chart">
+                        {{ chart('win-loss', 'Wins vs Losses Chart') }}
                     </div>
                     <div class="chart-container">
                         <h3>Points Per Game</h3>
-                        <img src="data:image/png;base64,{{ points_chart }}" alt="Points Per Game Chart">
+                        {{ chart('ppg', 'Points Per Game Chart') }}
                     </div>
                 </div>
             </section>
@@ -518,7 +2024,7 @@ HTML_TEMPLATE = '''
                                 <td><strong>{{ team.name }}</strong></td>
                                 <td>{{ team.conference }}</td>
                                 <td>{{ team.wins }}-{{ team.losses }}</td>
-                                <td>{{ "%.3f"|format(team.wins/(team.wins+team.losses)) }}</td>
+                                <td>{{ "%.3f"|format(team.wins/(team.wins+team.losses) if team.wins + team.losses else 0) }}</td>
                                 <td>{{ team.ppg }}</td>
                                 <td>{{ team.opp_ppg }}</td>
                             </tr>
@@ -585,78 +2091,1294 @@ HTML_TEMPLATE = '''
         </div>
     </footer>
 
-    <script>
-        // Smooth scrolling for navigation links
-        document.querySelectorAll('a[href^="#"]').forEach(anchor => {
-            anchor.addEventListener('click', function (e) {
-                e.preventDefault();
-                document.querySelector(this.getAttribute('href')).scrollIntoView({
-                    behavior: 'smooth'
-                });
-            });
-        });
-    </script>
+    <script src="{{ asset_url('dashboard.js') }}" defer></script>
+    {% if chart_mode == 'client' %}
+    <script src="{{ asset_url('charts.js') }}" defer></script>
+    {% endif %}
 </body>
 </html>
 '''
 
+# Compiled once; Flask's render_template_string would recompile it per request.
+DASHBOARD_TEMPLATE = app.jinja_env.from_string(HTML_TEMPLATE)
+
+def dumps_json(obj):
+    """Serialize to compact UTF-8 JSON bytes, using orjson when it is installed"""
+    with span('serialize.json'):
+        if orjson is not None:
+            return orjson.dumps(obj)
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode()
+
+# Columns and filters exposed by /api/<table>. Text filters match exactly and
+# may be repeated (team=A&team=B); numeric and date filters take a comparison
+# such as ppg>=25, wins<40 or date>=2024-01-01.
+ApiTable = namedtuple('ApiTable', ['columns', 'text_filters', 'numeric_filters', 'date_filters'],
+                      defaults=((),))
+API_TABLES = {
+    'teams': ApiTable(('id', 'name', 'conference', 'wins', 'losses', 'ppg', 'opp_ppg'),
+                      ('name', 'conference'), ('wins', 'losses', 'ppg', 'opp_ppg')),
+    'players': ApiTable(('id', 'name', 'team', 'position', 'ppg', 'rpg', 'apg', 'fg_pct'),
+                        ('name', 'team', 'position'), ('ppg', 'rpg', 'apg', 'fg_pct')),
+    'games': ApiTable(('id', 'date', 'home_team_id', 'home_team', 'away_team_id', 'away_team',
+                       'home_score', 'away_score'),
+                      ('home_team', 'away_team'),
+                      ('home_score', 'away_score', 'home_team_id', 'away_team_id'), ('date',)),
+}
+API_DEFAULT_LIMIT = 500
+API_MAX_LIMIT = 5000
+COMPARISON_FILTER = re.compile(r'^(\w+)(>=|<=|>|<|=)(-?\d+(?:\.\d+)?|\d{4}-\d{2}-\d{2})$')
+
+def _int_arg(name, default, minimum):
+    value = request.args.get(name, default)
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        abort(400, description=f'{name} must be an integer')
+    if value < minimum:
+        abort(400, description=f'{name} must be at least {minimum}')
+    return value
+
+def request_season():
+    """The season named by ?season= (None for the current one); 400 if malformed, 404 if unknown"""
+    try:
+        return resolve_season(request.args.get('season'))
+    except ValueError as exc:
+        abort(400, description=str(exc))
+    except LookupError as exc:
+        abort(404, description=str(exc))
+
+def build_api_query(table, args, paginate=True, extra_where=(), extra_args=()):
+    """Translate /api query args into (sql, params, fields, limit) for `table`
+
+    With paginate=False there is no LIMIT and `limit` is None. `extra_where`
+    adds (clause, params) pairs built by the caller from the `extra_args` keys.
+    """
+    spec = API_TABLES[table]
+    fields = spec.columns
+    if args.get('fields'):
+        fields = tuple(field.strip() for field in args['fields'].split(','))
+        unknown = [field for field in fields if field not in spec.columns]
+        if unknown:
+            abort(400, description=f'unknown fields: {", ".join(unknown)}')
+
+    where, params = [], []
+    for clause, clause_params in extra_where:
+        where.append(clause)
+        params.extend(clause_params)
+    for column in spec.text_filters:
+        values = args.getlist(column)
+        if values:
+            where.append(f'{column} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+    for key, value in args.items(multi=True):
+        if key in ('fields', 'limit', 'after', 'season') or key in spec.text_filters or key in extra_args:
+            continue
+        # ppg>=25 arrives as key "ppg>" and value "25"; ppg>25 as key "ppg>25"
+        match = COMPARISON_FILTER.match(f'{key}={value}' if value else key)
+        column, op, operand = match.groups() if match else (None, None, None)
+        try:
+            if column in spec.numeric_filters:
+                operand = float(operand)
+            elif column in spec.date_filters:
+                operand = date.fromisoformat(operand).isoformat()
+            else:
+                raise ValueError
+        except ValueError:
+            abort(400, description=f'unsupported filter: {key}{"=" + value if value else ""}')
+        where.append(f'{column} {op} ?')
+        params.append(operand)
+
+    after = args.get('after')
+    if after is not None:
+        where.append('id > ?')
+        params.append(_int_arg('after', None, 0))
+    if not paginate:
+        sql = f'SELECT {", ".join(fields)} FROM {table}'
+        if where:
+            sql += ' WHERE ' + ' AND '.join(where)
+        return sql + ' ORDER BY id', params, fields, None
+
+    limit = min(_int_arg('limit', API_DEFAULT_LIMIT, 1), API_MAX_LIMIT)
+
+    # id is always selected so the next page's cursor can be taken from the last row
+    columns = fields if 'id' in fields else ('id',) + fields
+    sql = f'SELECT {", ".join(columns)} FROM {table}'
+    if where:
+        sql += ' WHERE ' + ' AND '.join(where)
+    sql += ' ORDER BY id LIMIT ?'
+    params.append(limit + 1)
+    return sql, params, fields, limit
+
+def api_etag(table, version, full_path, variant=''):
+    """ETag for an /api response: the table version, the full request path (so
+    each page, filter and projection has its own) and `variant` for content negotiation"""
+    return hashlib.sha1(f'{table}:{version}:{full_path}:{variant}'.encode()).hexdigest()
+
+def cached_api_response(table, build, variant=''):
+    """Answer If-None-Match from `table`'s data version in the requested season alone, else return build()"""
+    etag = api_etag(table, get_data_versions(get_db(request_season()))[table], request.full_path, variant)
+    if request.if_none_match.contains_weak(etag):
+        response = Response(status=304)
+    else:
+        response = build()
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = app.config['API_CACHE_CONTROL']
+    return response
+
+def api_page(table):
+    """One keyset-paginated page of `table` as a JSON array, with a Link header to the next"""
+    return cached_api_response(table, lambda: _build_api_page(table))
+
+def _build_api_page(table):
+    sql, params, fields, limit = build_api_query(table, request.args)
+    return _api_page_response(sql, params, fields, limit)
+
+def _api_page_response(sql, params, fields, limit):
+    with span('db.api'):
+        cursor = get_db(request_season()).execute(sql, params)
+        columns = [col[0] for col in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor]
+
+    next_url = None
+    if len(rows) > limit:
+        rows.pop()
+        args = request.args.to_dict(flat=False)
+        args['after'] = rows[-1]['id']
+        next_url = url_for(request.endpoint, **args)
+    if 'id' not in fields:
+        for row in rows:
+            del row['id']
+
+    response = Response(dumps_json(rows), mimetype='application/json')
+    if next_url:
+        response.headers['Link'] = f'<{next_url}>; rel="next"'
+    return response
+
+# Static dashboard assets by name: (body, mimetype, etag). Pages link them with
+# the etag as ?v=, so a versioned URL can be cached for a year.
+Asset = namedtuple('Asset', ['body', 'mimetype', 'etag'])
+ASSETS = {
+    name: Asset(body.encode(), mimetype, hashlib.sha1(body.encode()).hexdigest()[:16])
+    for name, body, mimetype in [('dashboard.css', DASHBOARD_CSS, 'text/css'),
+                                 ('dashboard.js', DASHBOARD_JS, 'text/javascript'),
+                                 ('charts.js', CHARTS_JS, 'text/javascript')]
+}
+ASSET_MAX_AGE = 365 * 24 * 3600
+
+@app.template_global()
+def asset_url(name):
+    return url_for('asset', name=name, v=ASSETS[name].etag)
+
+@app.route('/assets/<name>')
+def asset(name):
+    if name not in ASSETS:
+        abort(404)
+    body, mimetype, etag = ASSETS[name]
+    response = Response(body, mimetype=mimetype)
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if request.args.get('v') == etag:
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Rendered dashboard pages, keyed by the season, the teams/players versions
+# they show, the chart mode and the seasons listed. Each entry is (etag, html
+# bytes); its compressed variants are made when it is rendered.
+PAGE_CACHE_MAX_ENTRIES = 8
+_page_cache = OrderedDict()
+_page_cache_lock = threading.Lock()
+page_cache_stats = {'hits': 0, 'misses': 0}
+
+def render_dashboard(snapshot, mode, seasons):
+    """(etag, html) of the dashboard for `snapshot`, rendered once per data version and chart mode
+
+    `seasons` are the available seasons, current first, for the season menu.
+    """
+    key = (snapshot.season, snapshot.versions['teams'], snapshot.versions['players'], mode, tuple(seasons))
+    with _page_cache_lock:
+        entry = _page_cache.get(key)
+        if entry is not None:
+            _page_cache.move_to_end(key)
+            page_cache_stats['hits'] += 1
+            return entry
+        page_cache_stats['misses'] += 1
+
+    with span('template.dashboard'):
+        body = render_template(DASHBOARD_TEMPLATE,
+                               teams=snapshot.teams,
+                               players=snapshot.players,
+                               total_teams=snapshot.total_teams,
+                               total_players=snapshot.total_players,
+                               avg_ppg=snapshot.avg_ppg,
+                               best_team=snapshot.best_team,
+                               season=snapshot.season,
+                               seasons=seasons,
+                               chart_versions={name: data.etag for name, data in snapshot.chart_data.items()},
+                               chart_mode=mode).encode()
+    entry = (hashlib.sha1(body).hexdigest(), body)
+    queue_precompress('text/html', *entry)
+    with _page_cache_lock:
+        _page_cache[key] = entry
+        while len(_page_cache) > PAGE_CACHE_MAX_ENTRIES:
+            _page_cache.popitem(last=False)
+    return entry
+
 @app.route('/')
 def index():
-    # Initialize sample data
-    init_sample_data()
-    
-    # Connect to database
-    conn = sqlite3.connect('nba_sample.db')
-    
-    # Get teams data
-    teams = pd.read_sql_query("SELECT * FROM teams ORDER BY wins DESC", conn).to_dict('records')
-    
-    # Get players data
-    players = pd.read_sql_query("SELECT * FROM players ORDER BY ppg DESC", conn).to_dict('records')
-    
-    # Calculate stats for dashboard
-    total_teams = len(teams)
-    total_players = len(players)
-    avg_ppg = round(pd.read_sql_query("SELECT AVG(ppg) as avg_ppg FROM teams", conn)['avg_ppg'].iloc[0], 1)
-    
-    # Find team with best record
-    best_team_df = pd.read_sql_query("SELECT name, wins, losses FROM teams ORDER BY wins DESC LIMIT 1", conn)
-    best_team = f"{best_team_df['name'].iloc[0]} ({best_team_df['wins'].iloc[0]}-{best_team_df['losses'].iloc[0]})"
-    
-    conn.close()
-    
-    # Create charts
-    win_loss_chart = create_win_loss_chart()
-    points_chart = create_points_chart()
-    
-    return render_template_string(HTML_TEMPLATE, 
-                                teams=teams,
-                                players=players,
-                                total_teams=total_teams,
-                                total_players=total_players,
-                                avg_ppg=avg_ppg,
-                                best_team=best_team,
-                                win_loss_chart=win_loss_chart,
-                                points_chart=points_chart)
+    etag, body = render_dashboard(get_dashboard_snapshot(request_season()), chart_mode(), available_seasons())
+    response = Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+# Response compression. Every compressible, non-streamed 200 is sent gzip- or
+# brotli-encoded when the client accepts it. Bodies with an ETag are cached
+# bodies (pages, assets, charts, API pages), so their compressed variants are
+# kept by (mimetype, etag) and compressed only once. A response compresses
+# inline only the encoding it negotiated, at a moderate level. Newly
+# rendered pages are queued, and the pre-render thread replaces their
+# variants at the best level (brotli 11 takes about a second on a large page).
+COMPRESSIBLE_MIMETYPES = frozenset({
+    'text/html', 'text/css', 'text/javascript', 'text/csv', 'application/json', 'image/svg+xml'})
+COMPRESS_MIN_BYTES = 1024
+COMPRESSION_CACHE_MAX_ENTRIES = 128
+_compressed_cache = OrderedDict()
+_compressed_cache_lock = threading.Lock()
+compression_cache_stats = {'hits': 0, 'misses': 0}
+# (mimetype, etag) -> body awaiting precompress(), oldest first
+_precompress_queue = {}
+
+def content_encodings():
+    """Supported Content-Encodings, most preferred first"""
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+def compress_body(body, encoding, best=False):
+    with span(f'compress.{encoding}'):
+        if encoding == 'br':
+            return brotli.compress(body, quality=11 if best else 5)
+        return gzip.compress(body, compresslevel=9 if best else 6, mtime=0)
+
+def _store_compressed(key, body):
+    with _compressed_cache_lock:
+        _compressed_cache[key] = body
+        while len(_compressed_cache) > COMPRESSION_CACHE_MAX_ENTRIES:
+            _compressed_cache.popitem(last=False)
+
+def precompress(mimetype, etag, body):
+    """Compress a cached body with every supported encoding at the best level; slow, so run it off the request"""
+    for encoding in content_encodings():
+        _store_compressed((mimetype, etag, encoding), compress_body(body, encoding, best=True))
+
+def queue_precompress(mimetype, etag, body):
+    """Queue a cached body for precompress() on the pre-render thread, keeping the newest few"""
+    with _compressed_cache_lock:
+        _precompress_queue[(mimetype, etag)] = body
+        while len(_precompress_queue) > PAGE_CACHE_MAX_ENTRIES:
+            del _precompress_queue[next(iter(_precompress_queue))]
+
+def precompress_queued():
+    while True:
+        with _compressed_cache_lock:
+            if not _precompress_queue:
+                return
+            (mimetype, etag), body = _precompress_queue.popitem()
+        precompress(mimetype, etag, body)
+
+def compressed_body(mimetype, etag, body, encoding):
+    """`body` in `encoding`, from the compressed-variant cache when it has an etag"""
+    if etag is None:
+        return compress_body(body, encoding)
+    key = (mimetype, etag, encoding)
+    with _compressed_cache_lock:
+        cached = _compressed_cache.get(key)
+        if cached is not None:
+            _compressed_cache.move_to_end(key)
+            compression_cache_stats['hits'] += 1
+            return cached
+        compression_cache_stats['misses'] += 1
+    cached = compress_body(body, encoding)
+    _store_compressed(key, cached)
+    return cached
+
+@app.after_request
+def compress_response(response):
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or 'Content-Encoding' in response.headers
+            or response.mimetype not in COMPRESSIBLE_MIMETYPES):
+        return response
+    response.vary.add('Accept-Encoding')
+    encoding = request.accept_encodings.best_match(content_encodings())
+    body = response.get_data()
+    if encoding is None or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    etag, _ = response.get_etag()
+    response.set_data(compressed_body(response.mimetype, etag, body, encoding))
+    response.headers['Content-Encoding'] = encoding
+    if etag is not None:
+        # A different byte stream than the identity body, like nginx's gzip
+        response.set_etag(etag, weak=True)
+    return response
+
+def _chart_caching(response, etag):
+    """Set a chart's ETag and caching: immutable when the URL's ?v= is that ETag, else no-cache
+
+    The dashboard links charts with ?v=, so a page never shows charts of other data.
+    """
+    response.set_etag(etag)
+    response.cache_control.public = True
+    if request.args.get('v') == etag:
+        response.cache_control.max_age = ASSET_MAX_AGE
+        response.cache_control.immutable = True
+    else:
+        response.cache_control.no_cache = True
+    return response
+
+def _chart_text_response(name, body, mimetype):
+    """Serve a cheap-to-build chart format with the chart data's ETag"""
+    return _chart_caching(Response(body, mimetype=mimetype), name).make_conditional(request)
+
+@app.route('/charts/<name>.svg')
+def chart_svg(name):
+    if name not in CHART_SERIES:
+        abort(404)
+    data = get_dashboard_snapshot(request_season()).chart_data[name]
+    if request.if_none_match.contains_weak(data.etag):
+        return _chart_text_response(data.etag, b'', 'image/svg+xml')
+    with span(f'chart.svg.{name}'):
+        svg = render_svg_chart(CHART_SERIES[name](data))
+    return _chart_text_response(data.etag, svg, 'image/svg+xml')
+
+@app.route('/charts/<name>.json')
+def chart_series(name):
+    if name not in CHART_SERIES:
+        abort(404)
+    data = get_dashboard_snapshot(request_season()).chart_data[name]
+    if request.if_none_match.contains_weak(data.etag):
+        return _chart_text_response(data.etag, b'', 'application/json')
+    return _chart_text_response(data.etag, dumps_json(CHART_SERIES[name](data)), 'application/json')
+
+@app.route('/charts/<name>.png')
+def chart_image(name):
+    if name not in CHARTS:
+        abort(404)
+    chart = serve_chart(name, request_season())
+    response = _chart_caching(Response(chart.png, mimetype='image/png'), chart.etag)
+    response.last_modified = chart.last_modified
+    return response.make_conditional(request)
+
+# Rows pulled from the cursor per chunk of a streamed export; memory use is
+# bounded by this, not by the size of the table.
+EXPORT_CHUNK_ROWS = 2000
+EXPORT_FORMATS = {'ndjson': 'application/x-ndjson', 'csv': 'text/csv'}
+
+def _encode_ndjson(columns, rows):
+    return b''.join(dumps_json(dict(zip(columns, row))) + b'\n' for row in rows)
+
+def _encode_csv(columns, rows):
+    buffer = io.StringIO()
+    csv.writer(buffer, lineterminator='\n').writerows(rows)
+    return buffer.getvalue().encode()
+
+def iter_export(cursor, fmt, compress=False):
+    """Yield an export of `cursor` chunk by chunk, optionally gzip-compressed"""
+    columns = [col[0] for col in cursor.description]
+    encode = _encode_ndjson if fmt == 'ndjson' else _encode_csv
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31) if compress else None
+
+    def emit(data):
+        return compressor.compress(data) if compressor else data
+
+    if fmt == 'csv':
+        yield emit(_encode_csv(None, [columns]))
+    while True:
+        rows = cursor.fetchmany(EXPORT_CHUNK_ROWS)
+        if not rows:
+            break
+        chunk = emit(encode(columns, rows))
+        if chunk:
+            yield chunk
+    cursor.close()
+    if compressor:
+        yield compressor.flush()
+
+@app.route('/api/export/<table>.<fmt>')
+def api_export(table, fmt):
+    """Stream all matching rows of `table` as NDJSON or CSV; accepts the /api filters and fields="""
+    if table not in API_TABLES or fmt not in EXPORT_FORMATS:
+        abort(404)
+    compress = request.accept_encodings.best_match(('gzip', 'identity')) == 'gzip'
+
+    def build():
+        sql, params, _, _ = build_api_query(table, request.args, paginate=False)
+        cursor = get_db(request_season()).execute(sql, params)
+        response = Response(stream_with_context(iter_export(cursor, fmt, compress)),
+                            mimetype=EXPORT_FORMATS[fmt])
+        response.headers['Content-Disposition'] = f'attachment; filename={table}.{fmt}'
+        if compress:
+            response.content_encoding = 'gzip'
+        return response
+
+    response = cached_api_response(table, build, variant='gzip' if compress else '')
+    response.vary.add('Accept-Encoding')
+    return response
+
+@app.route('/api/snapshots/<table>')
+def api_snapshot(table):
+    """Manifest of `table`'s current columnar snapshot, with a download URL per .npy file"""
+    if table not in API_TABLES:
+        abort(404)
+
+    def build():
+        season = request_season()
+        snapshot = columnar_table(table, get_db(season))
+        with open(os.path.join(snapshot.path, 'manifest.json')) as f:
+            manifest = json.load(f)
+        manifest['files'] = {
+            name: url_for('api_snapshot_file', table=table, version=snapshot.version, name=name, season=season)
+            for name in ('strings',) + tuple(snapshot.columns)}
+        return Response(dumps_json(manifest), mimetype='application/json')
+
+    return cached_api_response(table, build)
+
+@app.route('/api/snapshots/<table>/v<int:version>/<name>.npy')
+def api_snapshot_file(table, version, name):
+    """One column of a snapshot version; immutable, so cacheable for good (404 once pruned)"""
+    if table not in API_TABLES or (name != 'strings' and name not in API_TABLES[table].columns):
+        abort(404)
+    season = request_season()
+    path = os.path.join(snapshot_dir(get_db(season)), table, f'v{version}', f'{name}.npy')
+    if not os.path.exists(path):
+        abort(404)
+    response = send_file(path, mimetype='application/octet-stream', download_name=f'{table}.{name}.npy',
+                         max_age=ASSET_MAX_AGE, etag=f'{season or ""}-{table}-{version}-{name}',
+                         conditional=True)
+    response.cache_control.immutable = True
+    return response
+
+@app.errorhandler(400)
+@app.errorhandler(404)
+def api_error(error):
+    if request.path.startswith('/api/'):
+        return jsonify(error=error.description), error.code
+    return error
 
 @app.route('/api/teams')
 def api_teams():
-    conn = sqlite3.connect('nba_sample.db')
-    teams = pd.read_sql_query("SELECT * FROM teams", conn).to_dict('records')
-    conn.close()
-    return jsonify(teams)
+    return api_page('teams')
 
 @app.route('/api/players')
 def api_players():
-    conn = sqlite3.connect('nba_sample.db')
-    players = pd.read_sql_query("SELECT * FROM players", conn).to_dict('records')
-    conn.close()
-    return jsonify(players)
+    return api_page('players')
+
+def resolve_team_id(value):
+    """Team id for a /api team argument given as an id or an exact team name"""
+    if value.isdigit():
+        return int(value)
+    row = get_db(request_season()).execute('SELECT id FROM teams WHERE name = ?', (value,)).fetchone()
+    if row is None:
+        abort(400, description=f'unknown team: {value}')
+    return row[0]
+
+@app.route('/api/games')
+def api_games():
+    """Games with the /api filters plus team= (either side) and opponent=, by id or name"""
+    extra_where = []
+    team = request.args.get('team')
+    opponent = request.args.get('opponent')
+    if opponent and not team:
+        abort(400, description='opponent requires team')
+    if team and opponent:
+        team_id, opponent_id = resolve_team_id(team), resolve_team_id(opponent)
+        extra_where.append(('((home_team_id = ? AND away_team_id = ?) OR '
+                            '(home_team_id = ? AND away_team_id = ?))',
+                            (team_id, opponent_id, opponent_id, team_id)))
+    elif team:
+        team_id = resolve_team_id(team)
+        extra_where.append(('(home_team_id = ? OR away_team_id = ?)', (team_id, team_id)))
+
+    def build():
+        sql, params, fields, limit = build_api_query(
+            'games', request.args, extra_where=extra_where, extra_args=('team', 'opponent'))
+        return _api_page_response(sql, params, fields, limit)
+
+    return cached_api_response('games', build)
+
+@app.route('/api/head-to-head')
+def api_head_to_head():
+    """Precomputed head-to-head records: the full matrix, one team's row, or one pairing"""
+    where, params = ['h.games > 0'], []
+    if request.args.get('team'):
+        where.append('h.team_id = ?')
+        params.append(resolve_team_id(request.args['team']))
+    if request.args.get('opponent'):
+        where.append('h.opponent_id = ?')
+        params.append(resolve_team_id(request.args['opponent']))
+    sql = f'''
+        SELECT h.team_id, t.name AS team, h.opponent_id, o.name AS opponent,
+               h.games, h.wins, h.losses, h.points_for, h.points_against
+        FROM head_to_head h
+        JOIN teams t ON t.id = h.team_id
+        JOIN teams o ON o.id = h.opponent_id
+        WHERE {' AND '.join(where)}
+        ORDER BY t.name, o.name
+    '''
+
+    def build():
+        with span('db.api'):
+            cursor = get_db(request_season()).execute(sql, params)
+            columns = [col[0] for col in cursor.description]
+            rows = [dict(zip(columns, row)) for row in cursor]
+        return Response(dumps_json(rows), mimetype='application/json')
+
+    return cached_api_response('games', build)
+
+@app.route('/api/seasons')
+def api_seasons():
+    """The seasons with data, current first; pass one as season= to any /api route or the dashboard"""
+    seasons = available_seasons()
+    return Response(dumps_json([{'season': season, 'current': season == seasons[0]} for season in seasons]),
+                    mimetype='application/json', headers={'Cache-Control': 'no-cache'})
+
+# Search. Each query word matches indexed words it is a prefix of, ranked by
+# bm25. A word can also match vocabulary words it is a likely misspelling of:
+# those are found through a trigram index over the folded vocabulary, built in
+# memory per data version, so "jokic", "Jokić" and "jokci" all find Jokić.
+SearchKind = namedtuple('SearchKind', ['table', 'columns'])
+SEARCH_KINDS = {
+    'team': SearchKind('teams', ('id', 'name', 'conference')),
+    'player': SearchKind('players', ('id', 'name', 'team', 'position')),
+}
+SEARCH_DEFAULT_LIMIT = 10
+SEARCH_MAX_LIMIT = 50
+FUZZY_MIN_SIMILARITY = 0.75
+FUZZY_TERMS_PER_WORD = 3
+
+def fold_text(text):
+    """Lowercase `text` and strip its diacritics, as the search tokenizer does"""
+    return ''.join(c for c in unicodedata.normalize('NFKD', text.lower()) if not unicodedata.combining(c))
+
+def _trigrams(word):
+    return {word[i:i + 3] for i in range(len(word) - 2)}
+
+def term_trigram_index(conn, table):
+    """{trigram: [indexed words containing it]} for `table`'s search vocabulary"""
+    index = {}
+    for (term,) in conn.execute(f'SELECT term FROM {table}_fts_terms'):
+        for gram in _trigrams(term):
+            index.setdefault(gram, []).append(term)
+    return index
+
+# Trigram indexes per (database, table), rebuilt when the table's
+# data_version moves; least recently used ones are dropped once
+# SEARCH_INDEX_MAX_ENTRIES are held.
+SEARCH_INDEX_MAX_ENTRIES = 8
+_search_indexes = OrderedDict()
+_search_index_lock = threading.Lock()
+
+def search_term_index(conn, table):
+    """term_trigram_index(conn, table), reused until `table` changes"""
+    version = get_data_versions(conn)[table]
+    key = (database_path(conn), table)
+    with _search_index_lock:
+        entry = _search_indexes.get(key)
+        if entry is not None and entry[0] == version:
+            _search_indexes.move_to_end(key)
+            return entry[1]
+    with span(f'search.index.{table}'):
+        index = term_trigram_index(conn, table)
+    with _search_index_lock:
+        _search_indexes[key] = (version, index)
+        _search_indexes.move_to_end(key)
+        while len(_search_indexes) > SEARCH_INDEX_MAX_ENTRIES:
+            _search_indexes.popitem(last=False)
+    return index
+
+def _similar_terms(index, word):
+    """Up to FUZZY_TERMS_PER_WORD vocabulary words close to `word`, most similar first"""
+    candidates = {term for gram in _trigrams(word) for term in index.get(gram, ())}
+    scored = [(difflib.SequenceMatcher(None, word, term).ratio(), term) for term in candidates]
+    return [term for score, term in sorted(scored, reverse=True)[:FUZZY_TERMS_PER_WORD]
+            if score >= FUZZY_MIN_SIMILARITY]
+
+def _fts_ids(conn, table, match, limit):
+    return [row[0] for row in conn.execute(
+        f'SELECT rowid FROM {table}_fts WHERE {table}_fts MATCH ? ORDER BY rank LIMIT ?',
+        (match, limit))]
+
+def search_names(conn, kind, query, limit):
+    """Rows of `kind` ('team' or 'player') matching `query`, best first
+
+    Each row has a `match` of 'word' (every query word is a prefix of a name
+    word) or 'fuzzy' (some query word only matched a similar spelling).
+    """
+    table, columns = SEARCH_KINDS[kind]
+    words = re.findall(r'\w+', fold_text(query))
+    if not words:
+        return []
+    with span('db.search'):
+        matches = dict.fromkeys(_fts_ids(conn, table, ' '.join(f'"{w}"*' for w in words), limit), 'word')
+        if len(matches) < limit:
+            index = search_term_index(conn, table)
+            alternatives = [[f'"{word}"*'] + [f'"{term}"' for term in _similar_terms(index, word)]
+                            for word in words]
+            if any(len(options) > 1 for options in alternatives):
+                match = ' AND '.join(f'({" OR ".join(options)})' for options in alternatives)
+                for id_ in _fts_ids(conn, table, match, limit + len(matches)):
+                    if len(matches) == limit:
+                        break
+                    matches.setdefault(id_, 'fuzzy')
+        if not matches:
+            return []
+        rows = {row[0]: dict(zip(columns, row)) for row in conn.execute(
+            f'SELECT {", ".join(columns)} FROM {table} WHERE id IN ({", ".join("?" * len(matches))})',
+            list(matches))}
+    return [dict(rows[id_], type=kind, match=match) for id_, match in matches.items() if id_ in rows]
+
+@app.route('/api/search')
+def api_search():
+    """Ranked team and player name search for autocomplete: q=, type=team|player, limit="""
+    query = request.args.get('q', '').strip()
+    if not query:
+        abort(400, description='q is required')
+    kinds = request.args.getlist('type') or list(SEARCH_KINDS)
+    unknown = [kind for kind in kinds if kind not in SEARCH_KINDS]
+    if unknown:
+        abort(400, description=f'unknown type: {", ".join(unknown)}')
+    limit = min(_int_arg('limit', SEARCH_DEFAULT_LIMIT, 1), SEARCH_MAX_LIMIT)
+
+    conn = get_db(request_season())
+
+    def build():
+        results = [row for kind in kinds for row in search_names(conn, kind, query, limit)]
+        # Word matches of either kind before fuzzy ones; teams first within each
+        results.sort(key=lambda row: row['match'] == 'fuzzy')
+        return Response(dumps_json(results[:limit]), mimetype='application/json')
+
+    versions = get_data_versions(conn)
+    return cached_api_response('players', build, variant=f'teams:{versions["teams"]}')
+
+def _metrics_response(table, compute):
+    return cached_api_response(
+        table, lambda: Response(dumps_json(compute()), mimetype='application/json'))
+
+@app.route('/api/metrics/teams')
+def api_metrics_teams():
+    conn = get_db(request_season())
+    return _metrics_response(
+        'teams', lambda: cached_metric('team_ratings', 'teams', compute_team_ratings, conn=conn))
+
+@app.route('/api/metrics/splits')
+def api_metrics_splits():
+    window = _int_arg('window', METRICS_ROLLING_WINDOW, 1)
+    conn = get_db(request_season())
+    return _metrics_response(
+        'games', lambda: cached_metric('game_splits', 'games', compute_game_splits, window, conn=conn))
+
+@app.route('/api/metrics/rolling')
+def api_metrics_rolling():
+    team = request.args.get('team')
+    if not team:
+        abort(400, description='team is required')
+    window = _int_arg('window', METRICS_ROLLING_WINDOW, 1)
+    conn = get_db(request_season())
+    return _metrics_response(
+        'games', lambda: cached_metric('rolling', 'games', compute_rolling_averages, team, window, conn=conn))
+
+# Request instrumentation. Every request is timed into nba_request_seconds by
+# endpoint, and a sampled fraction is run under cProfile, with the .prof files
+# written to PROFILE_DIR (open them with pstats or snakeviz). The sample rate
+# starts at NBA_PROFILE_SAMPLE_RATE and can be changed in every running worker
+# with `flask profile --rate 0.01`, which stores it in the settings table.
+# Metrics are per process: with several workers each scrape sees one of them.
+app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('NBA_PROFILE_SAMPLE_RATE', 0))
+app.config['PROFILE_DIR'] = os.environ.get(
+    'NBA_PROFILE_DIR', os.path.join(tempfile.gettempdir(), 'nba-profiles'))
+PROFILE_MAX_FILES = 200
+SETTINGS_TTL = 5.0
+_settings = {'values': {}, 'expires': 0.0}
+# cProfile cannot profile two requests at once; extra samples are skipped
+_profile_lock = threading.Lock()
+profile_stats = {'profiled': 0, 'skipped': 0}
+
+def runtime_settings():
+    """{name: value} from the settings table, re-read at most every SETTINGS_TTL seconds"""
+    now = time.monotonic()
+    if now >= _settings['expires']:
+        _settings['values'] = dict(get_db().execute('SELECT name, value FROM settings'))
+        _settings['expires'] = now + SETTINGS_TTL
+    return _settings['values']
+
+def profile_sample_rate():
+    value = runtime_settings().get('profile_sample_rate')
+    return float(value) if value is not None else app.config['PROFILE_SAMPLE_RATE']
+
+@app.before_request
+def _start_request_timing():
+    g.request_start = time.perf_counter()
+    g.profiler = None
+    rate = profile_sample_rate()
+    if rate > 0 and random.random() < rate:
+        if _profile_lock.acquire(blocking=False):
+            g.profiler = cProfile.Profile()
+            g.profiler.enable()
+        else:
+            profile_stats['skipped'] += 1
+
+@app.teardown_request
+def _finish_request_timing(error=None):
+    profiler = g.pop('profiler', None)
+    if profiler is not None:
+        profiler.disable()
+        _profile_lock.release()
+        _save_profile(profiler)
+    if 'request_start' in g:
+        observe('nba_request_seconds', request.endpoint or 'unmatched',
+                time.perf_counter() - g.request_start)
+
+def _save_profile(profiler):
+    directory = app.config['PROFILE_DIR']
+    os.makedirs(directory, exist_ok=True)
+    profiler.dump_stats(os.path.join(
+        directory, f'{time.time():.3f}-{request.endpoint or "unmatched"}-{os.getpid()}.prof'))
+    profile_stats['profiled'] += 1
+    files = sorted(os.listdir(directory))
+    for name in files[:-PROFILE_MAX_FILES]:
+        os.remove(os.path.join(directory, name))
+
+@app.cli.command('profile')
+@click.option('--rate', type=click.FloatRange(0, 1), required=True,
+              help='Fraction of requests to profile; 0 turns profiling off.')
+def profile_command(rate):
+    """Profile a sampled fraction of requests in every running worker."""
+    conn = connect_db()
+    try:
+        migrate_db(conn)
+        with conn:
+            save_setting(conn, 'profile_sample_rate', repr(rate))
+    finally:
+        conn.close()
+    click.echo(f'Profiling {rate:.2%} of requests within {SETTINGS_TTL:g}s; '
+               f'profiles go to {app.config["PROFILE_DIR"]}')
+
+def _prometheus_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+METRIC_HELP = {
+    'nba_request_seconds': ('endpoint', 'Request latency by Flask endpoint'),
+    'nba_span_seconds': ('span', 'Time spent in instrumented code: db.*, chart.*, metrics.*, '
+                                 'serialize.*, template.*, compress.*'),
+}
+
+def prometheus_metrics():
+    """This process's histograms, cache, connection and profiler counters in Prometheus text format"""
+    lines = []
+    with _histograms_lock:
+        histograms = {key: list(counts) for key, counts in _histograms.items()}
+    for metric, (label_name, help_text) in METRIC_HELP.items():
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} histogram']
+        for (name, label), counts in sorted(histograms.items()):
+            if name != metric:
+                continue
+            label = f'{label_name}="{_prometheus_label(label)}"'
+            cumulative = list(itertools.accumulate(counts[:-1]))
+            for bound, count in zip(HISTOGRAM_BUCKETS + ('+Inf',), cumulative):
+                lines.append(f'{metric}_bucket{{{label},le="{bound}"}} {count}')
+            lines.append(f'{metric}_sum{{{label}}} {counts[-1]:.6f}')
+            lines.append(f'{metric}_count{{{label}}} {cumulative[-1]}')
+
+    caches = {'chart': chart_cache_stats, 'page': page_cache_stats,
+              'compression': compression_cache_stats, 'metrics': metrics_cache_stats}
+    for metric, kind, help_text, values in [
+        ('nba_cache_hits_total', 'counter', 'Cache lookups answered from the cache',
+         {name: stats['hits'] for name, stats in caches.items()}),
+        ('nba_cache_misses_total', 'counter', 'Cache lookups that had to build the value',
+         {name: stats['misses'] for name, stats in caches.items()}),
+        ('nba_cache_hit_ratio', 'gauge', 'Hits / lookups since start-up',
+         {name: stats['hits'] / max(stats['hits'] + stats['misses'], 1)
+          for name, stats in caches.items()}),
+    ]:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}']
+        lines += [f'{metric}{{cache="{name}"}} {value:g}' for name, value in values.items()]
+
+    connections = db_stats()
+    for metric, kind, help_text, value in [
+        ('nba_db_connections_open', 'gauge', 'Pooled SQLite connections currently open',
+         connections['open']),
+        ('nba_db_connections_opened_total', 'counter', 'SQLite connections opened by the pool',
+         connections['misses']),
+        ('nba_db_connections_reused_total', 'counter', 'get_db() calls served by a pooled connection',
+         connections['hits']),
+        ('nba_db_connections_closed_total', 'counter', 'Pooled SQLite connections closed',
+         connections['closed']),
+        ('nba_change_waiters', 'gauge', 'Async clients waiting for a data change',
+         len(_change_waiters)),
+        ('nba_profiled_requests_total', 'counter', 'Requests profiled with cProfile',
+         profile_stats['profiled']),
+        ('nba_profile_skipped_total', 'counter', 'Sampled requests not profiled because another was',
+         profile_stats['skipped']),
+    ]:
+        lines += [f'# HELP {metric} {help_text}', f'# TYPE {metric} {kind}', f'{metric} {value}']
+    return '\n'.join(lines) + '\n'
+
+@app.route('/metrics')
+def metrics():
+    return Response(prometheus_metrics(), mimetype='text/plain; version=0.0.4',
+                    headers={'Cache-Control': 'no-store'})
+
+# Change notifications. One watcher thread per process polls data_version and
+# wakes every waiting client, so long-poll and SSE clients cost one tiny query
+# per interval in total instead of re-fetching their payload. A client passes
+# back the `token` it last saw as since= (or Last-Event-ID for SSE).
+CHANGE_POLL_INTERVAL = 0.5
+CHANGE_DEFAULT_TABLES = ('games', 'teams')
+CHANGE_LONG_POLL_TIMEOUT = 25
+CHANGE_MAX_TIMEOUT = 60
+CHANGE_SSE_HEARTBEAT = 15
+_change_versions = None
+_change_condition = threading.Condition()
+_change_waiters = set()
+_change_watcher = None
+
+def change_token(versions, tables):
+    return '.'.join(str(versions[table]) for table in tables)
+
+def change_args(args, last_event_id=None):
+    """(tables, since, timeout) from change-notification query args; ValueError if invalid"""
+    tables = tuple(t.strip() for t in args.get('tables', '').split(',') if t.strip())
+    unknown = [table for table in tables if table not in API_TABLES]
+    if unknown:
+        raise ValueError(f'unknown tables: {", ".join(unknown)}')
+    try:
+        timeout = float(args.get('timeout', CHANGE_LONG_POLL_TIMEOUT))
+    except ValueError:
+        raise ValueError('timeout must be a number') from None
+    if not 0 <= timeout <= CHANGE_MAX_TIMEOUT:
+        raise ValueError(f'timeout must be between 0 and {CHANGE_MAX_TIMEOUT}')
+    return tables or CHANGE_DEFAULT_TABLES, args.get('since', last_event_id), timeout
+
+def change_payload(versions, tables, since):
+    token = change_token(versions, tables)
+    return {'token': token, 'changed': token != since,
+            'versions': {table: versions[table] for table in tables}}
+
+def change_event(versions, tables, since):
+    """(token, text) of the next SSE message: a change event, or a keep-alive comment"""
+    token = change_token(versions, tables)
+    if token == since:
+        return token, ': keep-alive\n\n'
+    data = dumps_json(change_payload(versions, tables, since)).decode()
+    return token, f'id: {token}\nevent: change\ndata: {data}\n\n'
+
+def _watch_changes(conn, interval):
+    global _change_versions
+    while True:
+        time.sleep(interval)
+        try:
+            versions = get_data_versions(conn)
+        except Exception:
+            # Keep watching: no other thread would restart this one
+            app.logger.exception('change watcher failed to read data versions')
+            continue
+        if versions == _change_versions:
+            continue
+        with _change_condition:
+            _change_versions = versions
+            _change_condition.notify_all()
+            waiters = list(_change_waiters)
+            _change_waiters.clear()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake_waiter, future)
+
+def _wake_waiter(future):
+    if not future.done():
+        future.set_result(None)
+
+def start_change_watcher(interval=CHANGE_POLL_INTERVAL):
+    """Start this process's data_version watcher if it is not already running"""
+    global _change_versions, _change_watcher
+    with _change_condition:
+        if _change_watcher is None:
+            conn = connect_db()
+            _change_versions = get_data_versions(conn)
+            _change_watcher = threading.Thread(
+                target=_watch_changes, args=(conn, interval), name='change-watcher', daemon=True)
+            _change_watcher.start()
+
+def wait_for_change(tables, since, timeout):
+    """Block until the token for `tables` differs from `since` or `timeout` passes; return the versions"""
+    start_change_watcher()
+    with _change_condition:
+        _change_condition.wait_for(
+            lambda: change_token(_change_versions, tables) != since, timeout)
+        return _change_versions
+
+def iter_change_events(tables, since):
+    while True:
+        since, event = change_event(wait_for_change(tables, since, CHANGE_SSE_HEARTBEAT), tables, since)
+        yield event
+
+def _change_request():
+    try:
+        return change_args(request.args, request.headers.get('Last-Event-ID'))
+    except ValueError as exc:
+        abort(400, description=str(exc))
+
+@app.route('/api/changes')
+def api_changes():
+    """Long-poll: answer once the versions of tables= move past since=, or after timeout= seconds"""
+    tables, since, timeout = _change_request()
+    versions = wait_for_change(tables, since, timeout)
+    return Response(dumps_json(change_payload(versions, tables, since)),
+                    mimetype='application/json', headers={'Cache-Control': 'no-store'})
+
+@app.route('/api/changes/stream')
+def api_change_stream():
+    """Server-Sent Events: a `change` event whenever the versions of tables= move"""
+    tables, since, _ = _change_request()
+    return Response(iter_change_events(tables, since), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-store', 'X-Accel-Buffering': 'no'})
+
+# Async serving. Under a WSGI server every open long-poll or SSE request holds
+# a worker thread. asgi_app (via create_asgi_app) answers those, and ETag
+# revalidation of /api/teams and /api/players, on the event loop; everything
+# else runs the Flask app on a bounded executor whose threads keep their own
+# pooled connections.
+#   uvicorn --factory 'nba_web_app:create_asgi_app' --workers 4
+DB_EXECUTOR_WORKERS = int(os.environ.get('NBA_THREADS', 8))
+_db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='db')
+
+async def run_db(fn, *args):
+    """Run fn(*args) on the DB executor, where get_db() returns that thread's connection"""
+    return await asyncio.get_running_loop().run_in_executor(_db_executor, fn, *args)
+
+async def wait_for_change_async(tables, since, timeout):
+    """wait_for_change() for the event loop: waiting holds a future, not a thread"""
+    await run_db(start_change_watcher)
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + timeout
+    while True:
+        with _change_condition:
+            versions = _change_versions
+            remaining = deadline - loop.time()
+            if change_token(versions, tables) != since or remaining <= 0:
+                return versions
+            future = loop.create_future()
+            _change_waiters.add((loop, future))
+        try:
+            await asyncio.wait_for(future, remaining)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with _change_condition:
+                _change_waiters.discard((loop, future))
+
+def _wsgi_environ(scope, body):
+    server = scope.get('server') or ('localhost', 80)
+    environ = {
+        'REQUEST_METHOD': scope['method'],
+        'SCRIPT_NAME': scope.get('root_path', '').encode().decode('latin-1'),
+        'PATH_INFO': scope['path'].encode().decode('latin-1'),
+        'QUERY_STRING': scope['query_string'].decode('latin-1'),
+        'SERVER_NAME': server[0],
+        'SERVER_PORT': str(server[1]),
+        'SERVER_PROTOCOL': f'HTTP/{scope["http_version"]}',
+        'wsgi.version': (1, 0),
+        'wsgi.url_scheme': scope.get('scheme', 'http'),
+        'wsgi.input': io.BytesIO(body),
+        'wsgi.errors': sys.stderr,
+        'wsgi.multithread': True,
+        'wsgi.multiprocess': True,
+        'wsgi.run_once': False,
+    }
+    if scope.get('client'):
+        environ['REMOTE_ADDR'] = scope['client'][0]
+    for name, value in scope['headers']:
+        key = name.decode('latin-1').upper().replace('-', '_')
+        if key not in ('CONTENT_TYPE', 'CONTENT_LENGTH'):
+            key = 'HTTP_' + key
+        value = value.decode('latin-1')
+        environ[key] = f'{environ[key]},{value}' if key in environ else value
+    return environ
+
+async def _asgi_flask(scope, receive, send):
+    """Run the Flask app for one request on the DB executor, streaming its body back"""
+    body = b''
+    while True:
+        message = await receive()
+        body += message.get('body', b'')
+        if not message.get('more_body'):
+            break
+    environ = _wsgi_environ(scope, body)
+    loop = asyncio.get_running_loop()
+    started = {}
+
+    def start_response(status, headers, exc_info=None):
+        started.update(type='http.response.start', status=int(status[:3]), headers=[
+            (key.lower().encode('latin-1'), value.encode('latin-1')) for key, value in headers])
+
+    def send_sync(message):
+        asyncio.run_coroutine_threadsafe(send(message), loop).result()
+
+    # The whole response is iterated on one thread: streamed bodies such as
+    # exports keep their request context and cursor on the thread that made them.
+    def run():
+        chunks = app(environ, start_response)
+        try:
+            send_sync(started)
+            for chunk in chunks:
+                if chunk:
+                    send_sync({'type': 'http.response.body', 'body': chunk, 'more_body': True})
+        finally:
+            if hasattr(chunks, 'close'):
+                chunks.close()
+        send_sync({'type': 'http.response.body', 'body': b''})
+
+    await loop.run_in_executor(_db_executor, run)
+
+async def _asgi_send(send, status, body=b'', headers=(), more_body=False):
+    await send({'type': 'http.response.start', 'status': status,
+                'headers': [(key.encode('latin-1'), value.encode('latin-1')) for key, value in headers]})
+    await send({'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+async def _asgi_json(send, status, obj):
+    await _asgi_send(send, status, dumps_json(obj),
+                     [('content-type', 'application/json'), ('cache-control', 'no-store')])
+
+def _asgi_change_args(scope):
+    headers = dict(scope['headers'])
+    last_event_id = headers.get(b'last-event-id')
+    return change_args(dict(parse_qsl(scope['query_string'].decode())),
+                       last_event_id.decode('latin-1') if last_event_id else None)
+
+def _season_versions(query):
+    return get_data_versions(get_db(resolve_season(dict(parse_qsl(query)).get('season'))))
+
+async def _asgi_api_page(scope, receive, send):
+    """304 for a matching If-None-Match from the table version alone, else the Flask view"""
+    if_none_match = dict(scope['headers']).get(b'if-none-match')
+    if if_none_match:
+        table = scope['path'].rsplit('/', 1)[1]
+        query = scope['query_string'].decode()
+        try:
+            version = (await run_db(_season_versions, query))[table]
+        except (ValueError, LookupError):
+            # A bad season=; the Flask view answers with the error
+            await _asgi_flask(scope, receive, send)
+            return
+        etag = api_etag(table, version, f'{scope["path"]}?{query}')
+        if parse_etags(if_none_match.decode('latin-1')).contains_weak(etag):
+            await _asgi_send(send, 304, headers=[
+                ('etag', f'"{etag}"'), ('cache-control', app.config['API_CACHE_CONTROL'])])
+            return
+    await _asgi_flask(scope, receive, send)
+
+async def _asgi_changes(scope, receive, send):
+    try:
+        tables, since, timeout = _asgi_change_args(scope)
+    except ValueError as exc:
+        await _asgi_json(send, 400, {'error': str(exc)})
+        return
+    versions = await wait_for_change_async(tables, since, timeout)
+    await _asgi_json(send, 200, change_payload(versions, tables, since))
+
+async def _asgi_change_stream(scope, receive, send):
+    try:
+        tables, since, _ = _asgi_change_args(scope)
+    except ValueError as exc:
+        await _asgi_json(send, 400, {'error': str(exc)})
+        return
+
+    async def stream(since):
+        while True:
+            versions = await wait_for_change_async(tables, since, CHANGE_SSE_HEARTBEAT)
+            since, event = change_event(versions, tables, since)
+            await send({'type': 'http.response.body', 'body': event.encode(), 'more_body': True})
+
+    async def disconnected():
+        while (await receive())['type'] != 'http.disconnect':
+            pass
+
+    await _asgi_send(send, 200, more_body=True, headers=[
+        ('content-type', 'text/event-stream'), ('cache-control', 'no-store')])
+    tasks = [asyncio.ensure_future(stream(since)), asyncio.ensure_future(disconnected())]
+    await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    for task in tasks:
+        task.cancel()
+
+ASGI_ROUTES = {
+    '/api/changes': _asgi_changes,
+    '/api/changes/stream': _asgi_change_stream,
+    '/api/teams': _asgi_api_page,
+    '/api/players': _asgi_api_page,
+}
+
+async def asgi_app(scope, receive, send):
+    """ASGI entry point; see create_asgi_app()"""
+    if scope['type'] == 'lifespan':
+        while (await receive())['type'] != 'lifespan.shutdown':
+            await send({'type': 'lifespan.startup.complete'})
+        await send({'type': 'lifespan.shutdown.complete'})
+        return
+    handler = ASGI_ROUTES.get(scope['path']) if scope['method'] in ('GET', 'HEAD') else None
+    await (handler or _asgi_flask)(scope, receive, send)
+
+# Production serving. create_app() is the entry point for WSGI servers, e.g.
+#   gunicorn -w 4 -k gthread --threads 8 --preload 'nba_web_app:create_app()'
+# and serve() (or `flask --app nba_web_app serve`) runs that configuration
+# itself. Settings come from the environment:
+#   NBA_DATABASE, NBA_API_CACHE_CONTROL, NBA_CHART_MODE   (see above)
+#   NBA_SEED_SAMPLE_DATA  seed the sample teams/players into empty tables (1)
+#   NBA_PRERENDER_CHARTS  warm charts at start-up and re-render on change (1)
+#   NBA_HOST, NBA_PORT, NBA_WORKERS, NBA_THREADS  used by serve()
+# For the async variant see create_asgi_app() below.
+def _env_flag(name, default):
+    return os.environ.get(name, default).lower() in ('1', 'true', 'yes', 'on')
+
+app.config['SEED_SAMPLE_DATA'] = _env_flag('NBA_SEED_SAMPLE_DATA', '1')
+app.config['PRERENDER_CHARTS'] = _env_flag('NBA_PRERENDER_CHARTS', '1')
+
+# Set by create_app(); background services only run in served processes, not
+# in plain imports such as the flask CLI, tests or benchmarks.
+_serving = False
+_services_pid = None
+
+def create_app(config=None):
+    """Configure and initialize the app for serving; returns the Flask app
+
+    Migrations, seeding and chart warm-up run once in the calling process.
+    It is safe to call before a server forks its workers: each child gets
+    fresh connections, locks and chart workers (see _reinit_after_fork) and
+    starts its own pre-renderer on its first request.
+    """
+    global _serving
+    if config:
+        app.config.update(config)
+    init_db(seed=app.config['SEED_SAMPLE_DATA'])
+    if app.config['PRERENDER_CHARTS']:
+        render_all_charts()
+    if not _serving:
+        atexit.register(_stop_services)
+    _serving = True
+    return app
+
+def _stop_services():
+    """Stop the chart pre-renderer and close pooled connections as a served process exits"""
+    stop_chart_prerenderer()
+    close_all_db()
+
+@app.before_request
+def _start_worker_services():
+    global _services_pid
+    if _serving and _services_pid != os.getpid():
+        _services_pid = os.getpid()
+        if app.config['PRERENDER_CHARTS']:
+            start_chart_prerenderer()
+
+# Connections inherited from the parent are kept referenced but never used or
+# closed in the child, as SQLite requires of connections crossing a fork.
+_inherited_connections = []
+
+def _reinit_after_fork():
+    """Give a forked worker its own connection pool, locks and chart threads"""
+    global _db_lock, _snapshot_lock, _chart_cache_lock, _render_lock, _metrics_cache_lock
+    global _page_cache_lock, _compressed_cache_lock, _histograms_lock, _profile_lock, _columnar_lock
+    global _search_index_lock
+    global _chart_executor, _prerender_thread, _prerender_stop
+    global _db_executor, _change_condition, _change_watcher
+    _inherited_connections.extend(conn for _, conn in _db_connections.values())
+    _db_connections.clear()
+    # A lock held by another thread at fork time would never be released here
+    _db_lock = threading.Lock()
+    _snapshot_lock = threading.Lock()
+    _chart_cache_lock = threading.Lock()
+    _render_lock = threading.Lock()
+    _metrics_cache_lock = threading.Lock()
+    _page_cache_lock = threading.Lock()
+    _compressed_cache_lock = threading.Lock()
+    _histograms_lock = threading.Lock()
+    _profile_lock = threading.Lock()
+    _columnar_lock = threading.Lock()
+    _search_index_lock = threading.Lock()
+    # The parent's pool threads and in-flight renders do not exist in the child
+    _pending_renders.clear()
+    _chart_executor = ThreadPoolExecutor(max_workers=CHART_RENDER_WORKERS, thread_name_prefix='chart')
+    _prerender_thread = None
+    _prerender_stop = threading.Event()
+    _db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix='db')
+    _change_condition = threading.Condition()
+    _change_waiters.clear()
+    _change_watcher = None
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reinit_after_fork)
+
+def create_asgi_app(config=None):
+    """create_app() for ASGI servers; returns asgi_app"""
+    create_app(config)
+    return asgi_app
+
+def serve(host=None, port=None, workers=None, threads=None):
+    """Run the app with a production server: gunicorn, else waitress, else Werkzeug
+
+    gunicorn runs `workers` forked processes with `threads` threads each and
+    the app preloaded; waitress and the Werkzeug fallback are single-process
+    and threaded.
+    """
+    host = host or os.environ.get('NBA_HOST', '0.0.0.0')
+    port = int(port or os.environ.get('NBA_PORT', 5000))
+    workers = int(workers or os.environ.get('NBA_WORKERS', min(4, os.cpu_count() or 1)))
+    threads = int(threads or os.environ.get('NBA_THREADS', 8))
+
+    try:
+        from gunicorn.app.base import BaseApplication
+    except ImportError:
+        BaseApplication = None
+    if BaseApplication is not None:
+        options = {
+            'bind': f'{host}:{port}', 'workers': workers, 'threads': threads,
+            'worker_class': 'gthread', 'preload_app': True,
+        }
+
+        class Server(BaseApplication):
+            def load_config(self):
+                for key, value in options.items():
+                    self.cfg.set(key, value)
+
+            def load(self):
+                return create_app()
+
+        Server().run()
+        return
+
+    create_app()
+    try:
+        import waitress
+    except ImportError:
+        from werkzeug.serving import run_simple
+        app.logger.warning('gunicorn/waitress not installed; using the threaded Werkzeug server')
+        run_simple(host, port, app, threaded=True)
+    else:
+        waitress.serve(app, host=host, port=port, threads=threads)
+
+@app.cli.command('serve')
+@click.option('--host', default=None, help='Interface to bind (NBA_HOST, default 0.0.0.0).')
+@click.option('--port', type=int, default=None, help='Port (NBA_PORT, default 5000).')
+@click.option('--workers', type=int, default=None, help='Worker processes (NBA_WORKERS).')
+@click.option('--threads', type=int, default=None, help='Threads per worker (NBA_THREADS, default 8).')
+def serve_command(host, port, workers, threads):
+    """Serve the app with a multi-worker production server."""
+    serve(host, port, workers, threads)
 
 if __name__ == '__main__':
     print("🚀 Starting NBA Data Hub...")
-    print("📊 Initializing sample data...")
-    init_sample_data()
-    print("🌐 Web server starting at http://localhost:5000")
-    print("✅ NBA Data Hub is ready!")
-    app.run(debug=True, host='0.0.0.0', port=5000)
\ No newline at end of file
+    if _env_flag('NBA_DEBUG', '0'):
+        print("📊 Initializing sample data...")
+        create_app()
+        print("🌐 Development server starting at http://localhost:5000")
+        print("✅ NBA Data Hub is ready!")
+        app.run(debug=True, host='0.0.0.0', port=5000, use_reloader=False)
+    else:
+        serve()
\ No newline at end of file